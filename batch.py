@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+
+from lib.batch import ENGINES, add_cache_argument, add_workers_argument, iter_jobs, solve_batch
+from lib.logging import setup_logging
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True)
+    if args.chunksize is None:
+        args.chunksize = 1024 if args.engine == "numpy" else 16
+    logging.debug(f"[INIT] Parsed args | {args=}")
+    counts = dict()
+    for record in solve_batch(
+        iter_jobs(args.puzzles),
+        workers=args.workers,
+        chunksize=args.chunksize,
+        search=args.search,
+        engine=args.engine,
+        cache=args.cache,
+        count=args.count_solutions,
+    ):
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        print(json.dumps(record), flush=True)
+    logging.info(f"[BATCH] Done | {counts=}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Solve many sudoku puzzles and stream one JSON record per puzzle"
+    )
+    parser.add_argument(
+        "puzzles",
+        nargs="+",
+        help="A directory of *.sudoku files, a glob, a file with one or more puzzles in it, or - for stdin",
+    )
+    add_workers_argument(parser)
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="How many puzzles to hand a worker at a time (default: 16, or 1024 with --engine numpy)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="sudoku",
+        help="Solve puzzles one at a time, or a whole chunk at once with numpy (needs numpy installed)",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Fall back to trial and error when the logical techniques run out of clues",
+    )
+    parser.add_argument(
+        "--count-solutions",
+        type=int,
+        default=None,
+        metavar="LIMIT",
+        help="Also count each puzzle's solutions, stopping at LIMIT (2 is enough to tell whether it has exactly one). Ignores --search, --engine and --cache",
+    )
+    add_cache_argument(parser)
+    args = parser.parse_args()
+    if args.count_solutions is not None and args.count_solutions < 1:
+        parser.error("--count-solutions needs a LIMIT of 1 or more")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers needs to be 1 or more")
+    if args.engine == "numpy":
+        try:
+            import numpy
+        except ImportError:
+            parser.error("--engine numpy needs numpy, try 'pip install numpy'")
+    return args
+
+
+if __name__ == "__main__":
+    main()
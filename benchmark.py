@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+
+from lib.batch import iter_jobs
+from lib.benchmark import find_regressions, run_benchmark
+from lib.logging import setup_logging
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True, level=logging.WARNING)
+    logging.debug(f"[INIT] Parsed args | {args=}")
+
+    # The solver logs every stalled puzzle, which would drown out the report
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.CRITICAL)
+    report = run_benchmark(iter_jobs(args.puzzles), search=args.search, repeat=args.repeat)
+    logging.getLogger().setLevel(level)
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    logging.warning(
+        f"[BENCHMARK] Done | puzzles={report['puzzles']} puzzles_per_second={report['puzzles_per_second']:.1f}"
+    )
+
+    if args.baseline is None:
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(report, baseline, tolerance=args.tolerance)
+    for regression in regressions:
+        logging.error(f"[BENCHMARK] [REGRESSION] {regression}")
+    if len(regressions) != 0:
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time the solver over a corpus of puzzles and report it as JSON"
+    )
+    parser.add_argument(
+        "puzzles",
+        nargs="*",
+        default=["data"],
+        help="Directories of *.sudoku files, globs, files with one or more puzzles in them, or - for stdin (default: data)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="How many times to solve each puzzle",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Fall back to trial and error when the logical techniques run out of clues",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the report here instead of to stdout",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="An earlier report to compare against. Exits 1 if this run is slower",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="How much slower than the baseline is still fine, as a fraction",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
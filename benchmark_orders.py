@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+
+from lib.logging import setup_logging
+from lib.scaling import run_scaling_benchmark
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True, level=logging.WARNING)
+    logging.debug(f"[INIT] Parsed args | {args=}")
+
+    # The solver logs every stalled puzzle, which would drown out the report
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.CRITICAL)
+    report = run_scaling_benchmark(
+        args.orders, count=args.count, seed=args.seed, blanks=args.blanks, search=args.search
+    )
+    logging.getLogger().setLevel(level)
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    for entry in report["orders"]:
+        logging.warning(
+            f"[BENCHMARK] {entry['size']} | p50={entry['latency']['p50'] * 1000:.1f}ms statuses={entry['statuses']}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time the solver on generated 9x9, 16x16 and 25x25 puzzles and report how solve time grows with the board, as JSON"
+    )
+    parser.add_argument(
+        "--orders",
+        type=int,
+        nargs="+",
+        default=[3, 4, 5],
+        choices=[2, 3, 4, 5],
+        help="The board orders to time: 3 is 9x9, 4 is 16x16, 5 is 25x25 (default: 3 4 5)",
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=20,
+        help="How many puzzles to solve per order",
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        help="Where the puzzles come from. The same seed always makes the same puzzles",
+    )
+    parser.add_argument(
+        "--blanks",
+        type=float,
+        default=0.3,
+        help="The fraction of cells to blank in every puzzle",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Fall back to trial and error when the logical techniques run out of clues. The made-up puzzles can have many solutions, which the search can take a long time to wade through on the bigger boards",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the report here instead of to stdout",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
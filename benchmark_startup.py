@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+
+from lib.logging import setup_logging
+from lib.startup import find_startup_regressions, run_startup_benchmark
+
+# Modules 'main.py' used to import on every run and has no need for
+FORBIDDEN = ("dataclasses", "inspect", "typing", "pathlib", "json")
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True, level=logging.WARNING)
+    logging.debug(f"[INIT] Parsed args | {args=}")
+
+    report = run_startup_benchmark(args.puzzle, repeat=args.repeat)
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    logging.warning(
+        f"[BENCHMARK] Done | overhead={report['overhead'] * 1000:.1f}ms imports={report['imports']['total_ms']:.1f}ms"
+    )
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = find_startup_regressions(
+        report, baseline, tolerance=args.tolerance, forbidden=FORBIDDEN
+    )
+    for regression in regressions:
+        logging.error(f"[BENCHMARK] [REGRESSION] {regression}")
+    if len(regressions) != 0:
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time how long 'main.py' takes to start up and solve one puzzle, and what it imports on the way"
+    )
+    parser.add_argument(
+        "puzzle",
+        nargs="?",
+        default="data/medium.368907737.sudoku",
+        help="The puzzle file to hand 'main.py' (default: data/medium.368907737.sudoku)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=20,
+        help="How many times to start 'main.py'",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the report here instead of to stdout",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="An earlier report to compare against. Exits 1 if startup got slower",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="How much slower than the baseline is still fine, as a fraction",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import logging
+
+from lib.batch import iter_jobs
+from lib.logging import setup_logging
+from lib.server import send_puzzles
+
+
+async def stream(args):
+    counts = dict()
+    async for record in send_puzzles(
+        iter_jobs(args.puzzles),
+        path=args.socket,
+        host=args.host,
+        port=args.port,
+        search=args.search,
+    ):
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        print(json.dumps(record), flush=True)
+    logging.info(f"[CLIENT] Done | {counts=}")
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True)
+    logging.debug(f"[INIT] Parsed args | {args=}")
+    asyncio.run(stream(args))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Send sudoku puzzles to a running 'serve.py' and stream one JSON record per puzzle"
+    )
+    parser.add_argument(
+        "puzzles",
+        nargs="+",
+        help="A directory of *.sudoku files, a glob, a file with one or more puzzles in it, or - for stdin",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Connect to this unix socket instead of TCP",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="TCP host to connect to")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to connect to")
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Fall back to trial and error when the logical techniques run out of clues",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Lets pytest import 'lib' from the tests, however it is run
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+
+from lib.batch import add_workers_argument
+from lib.generator import DIFFICULTIES, generate
+from lib.logging import setup_logging
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True)
+    logging.debug(f"[INIT] Parsed args | {args=}")
+    out = sys.stdout if args.output is None else open(args.output, "w")
+    counts = dict()
+    try:
+        for record in generate(
+            args.count,
+            seed=args.seed,
+            difficulty=args.difficulty,
+            workers=args.workers,
+            chunksize=args.chunksize,
+        ):
+            counts[record["difficulty"]] = counts.get(record["difficulty"], 0) + 1
+            if args.format == "jsonl":
+                out.write(json.dumps(record) + "\n")
+            else:
+                out.write(record["puzzle"] + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logging.info(f"[GENERATE] Done | {counts=}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate uniquely solvable sudoku puzzles, rated by the techniques they need"
+    )
+    parser.add_argument("--count", type=int, default=100, help="How many puzzles to generate")
+    parser.add_argument(
+        "--seed",
+        type=str,
+        default="0",
+        help="The same seed always generates the same puzzles, whatever --workers is",
+    )
+    parser.add_argument(
+        "--difficulty",
+        choices=DIFFICULTIES,
+        default=None,
+        help="Only keep puzzles of this difficulty (default: keep everything)",
+    )
+    add_workers_argument(parser, doing="generate")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=16,
+        help="How many puzzles to hand a worker at a time",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("lines", "jsonl"),
+        default="lines",
+        help="One puzzle of 81 characters per line, or one JSON record per puzzle with its solution and rating",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write the puzzles here instead of to stdout",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
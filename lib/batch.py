@@ -0,0 +1,189 @@
+import glob
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lib.reader import iter_puzzles, parse_grid
+from lib.sudoku import ContradictionError, InvalidPuzzleError, OutOfTimeError, Sudoku
+
+""" Solve many sudoku puzzles at once across a pool of worker processes """
+
+
+def find_puzzle_files(target):
+    # A directory means every '*.sudoku' file in it, '-' means stdin, and
+    # anything else that isn't a file is treated as a glob
+    path = Path(target)
+    if target == "-" or path.is_file():
+        return [target]
+    if path.is_dir():
+        return sorted(str(p) for p in path.glob("*.sudoku"))
+    return sorted(p for p in glob.glob(target, recursive=True) if os.path.isfile(p))
+
+
+def iter_jobs(targets):
+    for target in targets:
+        filenames = find_puzzle_files(target)
+        if len(filenames) == 0:
+            logging.warning(f"[BATCH] No puzzles found | {target=}")
+        for filename in filenames:
+            yield from iter_puzzles(filename)
+
+
+# Each worker process opens its own connection to the solution cache
+worker_cache = None
+
+
+def init_worker(cache_path=None):
+    # Workers only report through their result records
+    logging.getLogger().setLevel(logging.CRITICAL)
+    global worker_cache
+    if cache_path is not None:
+        from lib.cache import SolutionCache
+
+        worker_cache = SolutionCache(cache_path)
+
+
+# The options of the scripts that run a pool of these workers: 'batch.py',
+# 'serve.py' and 'generate.py'
+def add_workers_argument(parser, doing="solve"):
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=f"How many worker processes to {doing} with (default: one per core)",
+    )
+
+
+def add_cache_argument(parser):
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="A sqlite file to remember solutions in, so repeated (or relabelled, rotated, transposed) puzzles aren't solved twice",
+    )
+
+
+def solve_puzzle(job, search=False, count=None, timeout=None):
+    # With 'count', the record also says how many solutions the puzzle has,
+    # up to 'count'. With 'timeout', a solve still going after that many
+    # seconds gives up with status "timeout"
+    name, lines = job
+    start = time.perf_counter()
+    record = {"puzzle": name, "status": None, "grid": None, "search_nodes": 0}
+    try:
+        if count is not None:
+            result = Sudoku(lines).count_solutions(count)
+        else:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            result = Sudoku(lines, search=search, deadline=deadline).solve()
+    except OutOfTimeError as e:
+        record.update(status="timeout", error=str(e))
+    except InvalidPuzzleError as e:
+        record.update(status="invalid", error=str(e))
+    except ContradictionError as e:
+        record.update(status="contradiction", error=str(e))
+    else:
+        record.update(
+            status=result.status,
+            grid=result.grid,
+            deductions=result.deductions,
+            search_nodes=result.search_nodes,
+        )
+        if count is not None:
+            record["solutions"] = result.solutions
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+# Where a chunk gets solved: "sudoku" solves its puzzles one by one, "numpy"
+# solves them all at once as one candidate cube (see 'lib.cube'), which pays
+# off for chunks of hundreds of easy puzzles or more
+ENGINES = ("sudoku", "numpy")
+
+
+def solve_chunk(chunk, search=False, engine="sudoku", cache=None, count=None, timeout=None):
+    # Puzzles the cache knows are answered from it, the rest get solved and
+    # their solutions stored. Counting solutions goes around both the cache
+    # and the numpy engine, neither knows whether a solution is the only one.
+    # 'timeout' is per puzzle, see 'solve_puzzle'. The numpy engine doesn't
+    # take one
+    if count is not None:
+        return [solve_puzzle(job, count=count) for job in chunk]
+    cache = cache or worker_cache
+    records = [None] * len(chunk)
+    grids = [None] * len(chunk)
+    if cache is not None:
+        for i, (name, lines) in enumerate(chunk):
+            start = time.perf_counter()
+            grids[i] = parse_grid(lines)
+            solution = cache.get(grids[i]) if grids[i] is not None else None
+            if solution is not None:
+                records[i] = {
+                    "puzzle": name,
+                    "status": "solved",
+                    "grid": solution,
+                    "search_nodes": 0,
+                    "cached": True,
+                    "elapsed": time.perf_counter() - start,
+                }
+
+    todo = [i for i, record in enumerate(records) if record is None]
+    jobs = [chunk[i] for i in todo]
+    if engine == "numpy":
+        from lib.cube import solve_cube
+
+        solved = solve_cube(jobs, search=search)
+    else:
+        solved = [solve_puzzle(job, search=search, timeout=timeout) for job in jobs]
+
+    for i, record in zip(todo, solved):
+        records[i] = record
+        # Only solutions the techniques worked out get stored. One the search
+        # guessed its way to would be handed to requests without search too
+        if (
+            cache is not None
+            and grids[i] is not None
+            and record["status"] == "solved"
+            and record["search_nodes"] == 0
+        ):
+            cache.put(grids[i], record["grid"])
+    return records
+
+
+def chunked(jobs, chunksize):
+    chunk = list()
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = list()
+    if len(chunk) != 0:
+        yield chunk
+
+
+def solve_batch(
+    jobs, workers=None, chunksize=16, search=False, engine="sudoku", cache=None, count=None
+):
+    # Yields one result record per job, in the order the jobs came in. Only a
+    # couple of chunks per worker are in flight at once, so 'jobs' can be an
+    # arbitrarily long stream. 'cache' is the path of a solution cache file
+    # for the workers to share. With 'count', every puzzle's solutions are
+    # counted up to 'count' instead (see 'Sudoku.count_solutions'): each
+    # worker counts its own puzzles, which keeps every core busy without
+    # splitting any one puzzle's search
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(cache,)
+    ) as pool:
+        in_flight = deque()
+        for chunk in chunked(jobs, chunksize):
+            in_flight.append(
+                pool.submit(solve_chunk, chunk, search=search, engine=engine, count=count)
+            )
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
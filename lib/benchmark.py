@@ -0,0 +1,94 @@
+import platform
+import time
+from collections import Counter
+
+from lib.stats import TechniqueStats
+from lib.sudoku import ContradictionError, InvalidPuzzleError, Sudoku
+
+""" Measure how fast 'Sudoku' gets through a corpus of puzzles """
+
+
+def percentile(ordered, q):
+    # Nearest-rank percentile of an already sorted list
+    if len(ordered) == 0:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def solve_once(lines, search=False, stats=False):
+    # Returns (status, sudoku). 'sudoku' is None when it couldn't be built
+    try:
+        sudoku = Sudoku(lines, search=search, stats=stats)
+        result = sudoku.solve()
+    except InvalidPuzzleError:
+        return "invalid", None
+    except ContradictionError:
+        return "contradiction", None
+    return result.status, sudoku
+
+
+def run_benchmark(jobs, search=False, repeat=1):
+    # Every puzzle is solved twice per round: once plain, to time it, and once
+    # with technique stats on, to see where that time goes. The stats wrappers
+    # cost something, so they never show up in the latencies
+    latencies = list()
+    slowest = list()
+    statuses = Counter()
+    deductions = Counter()
+    search_nodes = 0
+    techniques = TechniqueStats()
+
+    for name, lines in jobs:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            status, _ = solve_once(lines, search=search)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            slowest.append((elapsed, name))
+            slowest = sorted(slowest, reverse=True)[:5]
+            statuses[status] += 1
+
+            _, sudoku = solve_once(lines, search=search, stats=True)
+            if sudoku is not None:
+                techniques.merge(sudoku.stats)
+                deductions.update(sudoku.deductions)
+                search_nodes += sudoku.search_nodes
+
+    total = sum(latencies)
+    ordered = sorted(latencies)
+    return {
+        "python": platform.python_version(),
+        "search": search,
+        "repeat": repeat,
+        "puzzles": len(latencies),
+        "statuses": dict(statuses),
+        "seconds": total,
+        "puzzles_per_second": len(latencies) / total if total else 0.0,
+        "latency": {
+            "mean": total / len(latencies) if latencies else 0.0,
+            "p50": percentile(ordered, 50),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1] if ordered else 0.0,
+        },
+        "slowest": [{"puzzle": name, "seconds": elapsed} for elapsed, name in slowest],
+        **techniques.report(),
+        "deductions": dict(deductions),
+        "search_nodes": search_nodes,
+    }
+
+
+def find_regressions(report, baseline, tolerance=0.1):
+    # Compare against an earlier report. Anything more than 'tolerance' worse
+    # than the baseline is a regression
+    regressions = list()
+    before = baseline.get("puzzles_per_second", 0.0)
+    after = report["puzzles_per_second"]
+    if before and after < before * (1 - tolerance):
+        regressions.append(f"puzzles_per_second {before:.1f} -> {after:.1f}")
+    for key in ("p50", "p99"):
+        before = baseline.get("latency", {}).get(key, 0.0)
+        after = report["latency"][key]
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{key} {before * 1000:.3f}ms -> {after * 1000:.3f}ms")
+    return regressions
@@ -0,0 +1,142 @@
+import sqlite3
+from collections import OrderedDict
+
+""" Remember solved puzzles, including relabelled, rotated and transposed copies """
+
+# Puzzles are 81 numbers, row by row, 0 for blanks. Two puzzles are the same
+# puzzle if one turns into the other by
+# * relabelling the digits (swap every 1 for a 7 and every 7 for a 1, ...)
+# * any of the 8 rotations/reflections of the board
+# so the cache is keyed by a canonical form: of the 8 ways to turn the board,
+# the one that reads smallest once its digits are relabelled in order of
+# first appearance.
+
+
+def rotate(perm):
+    # Quarter turn clockwise. 'perm[i]' is the cell that ends up at 'i'
+    return tuple(perm[(8 - col_i) * 9 + row_i] for row_i in range(9) for col_i in range(9))
+
+
+def transpose(perm):
+    return tuple(perm[col_i * 9 + row_i] for row_i in range(9) for col_i in range(9))
+
+
+SYMMETRIES = list()
+for perm in (tuple(range(81)), transpose(tuple(range(81)))):
+    for _ in range(4):
+        SYMMETRIES.append(perm)
+        perm = rotate(perm)
+SYMMETRIES = tuple(SYMMETRIES)
+
+
+def canonicalize(grid):
+    # Returns (canonical string, symmetry, digits) where the canonical
+    # puzzle's cell 'i' is the original's cell 'symmetry[i]', with digit 'd'
+    # in the original written as 'digits.index(d)'
+    text = "".join(map(str, grid))
+    best = None
+    for perm in SYMMETRIES:
+        turned = "".join([text[cell] for cell in perm])
+        # Digits in order of first appearance
+        order = list(dict.fromkeys(turned.replace("0", "")))
+        key = turned.translate(
+            str.maketrans({digit: str(label) for label, digit in enumerate(order, start=1)})
+        )
+        if best is None or key < best[0]:
+            best = key, perm, [0] + [int(digit) for digit in order]
+    return best
+
+
+def solution_to_canonical(solution, perm, digits):
+    # 'digits' only knows the digits the puzzle started with. A puzzle given
+    # 8 of them has the ninth one left over
+    labels = {digit: label for label, digit in enumerate(digits)}
+    missing = [d for d in range(1, 10) if d not in labels]
+    for label, digit in enumerate(missing, start=len(digits)):
+        labels[digit] = label
+    return "".join(str(labels[int(solution[cell])]) for cell in perm)
+
+
+def solution_from_canonical(canonical, perm, digits):
+    missing = [d for d in range(1, 10) if d not in digits]
+    digits = list(digits) + missing
+    solution = [None] * 81
+    for i, cell in enumerate(perm):
+        solution[cell] = str(digits[int(canonical[i])])
+    return "".join(solution)
+
+
+# Two tiers: the most recently used solutions in memory, and every solution
+# ever stored in a sqlite file when 'path' is given. On top of that, puzzles
+# we've seen exactly as-is are answered straight out of memory, without
+# working out their canonical form.
+#
+# Only solved puzzles are worth remembering. Solutions are 81 characters,
+# like 'SolveResult.grid'.
+class SolutionCache:
+    def __init__(self, path=None, maxsize=4096):
+        self.maxsize = maxsize
+        self.exact = OrderedDict()
+        self.canonical = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS solutions (canonical TEXT PRIMARY KEY, solution TEXT NOT NULL)"
+            )
+            self.db.commit()
+
+    def remember(self, tier, key, value):
+        tier[key] = value
+        tier.move_to_end(key)
+        if len(tier) > self.maxsize:
+            tier.popitem(last=False)
+
+    def get(self, grid):
+        exact = "".join(map(str, grid))
+        solution = self.exact.get(exact)
+        if solution is not None:
+            self.exact.move_to_end(exact)
+            self.hits += 1
+            return solution
+
+        key, perm, digits = canonicalize(grid)
+        canonical = self.canonical.get(key)
+        if canonical is not None:
+            self.canonical.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute(
+                "SELECT solution FROM solutions WHERE canonical = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                canonical = row[0]
+                self.remember(self.canonical, key, canonical)
+        if canonical is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        solution = solution_from_canonical(canonical, perm, digits)
+        self.remember(self.exact, exact, solution)
+        return solution
+
+    def put(self, grid, solution):
+        key, perm, digits = canonicalize(grid)
+        canonical = solution_to_canonical(solution, perm, digits)
+        self.remember(self.canonical, key, canonical)
+        self.remember(self.exact, "".join(map(str, grid)), solution)
+        if self.db is not None:
+            self.db.execute(
+                "INSERT OR IGNORE INTO solutions (canonical, solution) VALUES (?, ?)",
+                (key, canonical),
+            )
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,195 @@
+import time
+
+import numpy as np
+
+from lib.batch import solve_puzzle
+from lib.reader import parse_grid
+
+""" Solve a whole block of sudoku puzzles at once as one numpy candidate cube """
+
+# Requires numpy, which the rest of the solver doesn't. Only import this
+# module when it is actually going to be used.
+#
+# A block of N puzzles is held as an (N, 9, 9, 9) boolean cube: cube[n, r, c, d]
+# is True while 'd + 1' is still a candidate for row 'r', col 'c' of puzzle
+# 'n'. Alongside it, values[n, r, c] is the answer (0 while unknown).
+#
+# Every step applies the same techniques 'Sudoku' starts with, to every
+# puzzle still going at once:
+# * Naked singles ("cell") and hidden singles ("row", "col", "box") get placed
+# * Placed numbers are erased from the rest of their row, col and box
+# * Daggers: a number that is stuck on one row/col segment of a box is
+#   erased from the rest of that row/col
+# Puzzles that stop moving without being solved, or that run into a
+# contradiction, are handed to the per-puzzle solver.
+
+DIGITS = np.arange(1, 10, dtype=np.int8)
+
+
+def parse_block(jobs):
+    # Returns (indexes of the jobs we could read, their values). Anything
+    # unreadable goes to the per-puzzle solver, which reports it properly
+    readable = list()
+    grids = list()
+    for i, (_, lines) in enumerate(jobs):
+        grid = parse_grid(lines)
+        if grid is None:
+            continue
+        readable.append(i)
+        grids.append(grid)
+    return readable, np.array(grids, dtype=np.int8).reshape(-1, 9, 9)
+
+
+def placed(values):
+    # One-hot (N, 9, 9, 9) of the answers we have
+    return values[..., None] == DIGITS
+
+
+def box_any(cube):
+    # (N, 9, 9, 9) ==> (N, 3, 3, 9): is the number anywhere in the box
+    return cube.reshape(-1, 3, 3, 3, 3, 9).any(axis=(2, 4))
+
+
+def eliminate(cube, values):
+    # Solved cells keep only their answer. Every other cell loses whatever is
+    # already placed in its row, col or box
+    answers = placed(values)
+    taken = (
+        answers.any(axis=2)[:, :, None, :]
+        | answers.any(axis=1)[:, None, :, :]
+        | np.repeat(np.repeat(box_any(answers), 3, axis=1), 3, axis=2)
+    )
+    solved = (values != 0)[..., None]
+    return np.where(solved, answers, cube & ~taken)
+
+
+def daggers(cube):
+    # A number stuck on one row segment of a box gets erased from the rest of
+    # the row. Returns what to erase, shaped like the cube. Run it on the
+    # transposed cube for cols
+    n = cube.shape[0]
+    # segments[n, band, row in band, stack, d]: is d on that row segment
+    segments = cube.reshape(n, 3, 3, 3, 3, 9).any(axis=4)
+    stuck = segments & (segments.sum(axis=2, keepdims=True) == 1)
+    # Erase from the segments of the same row in the other boxes
+    erase = (stuck.sum(axis=3, keepdims=True) - stuck) > 0
+    return np.repeat(erase, 3, axis=3).reshape(n, 9, 9, 9) & cube
+
+
+def find_singles(cube, values):
+    # Returns (new values, how many of each kind we found per puzzle). A cell
+    # that is a single for more than one reason counts once, in the order
+    # 'Sudoku' scans them
+    n = cube.shape[0]
+    open_cells = (values == 0)[..., None]
+    found = np.zeros((n, 9, 9, 9), dtype=bool)
+    counts = dict()
+
+    naked = open_cells & cube & (cube.sum(axis=3, keepdims=True) == 1)
+    counts["cell"] = naked.any(axis=3).sum(axis=(1, 2))
+    found |= naked
+
+    units = {
+        "row": cube & (cube.sum(axis=2, keepdims=True) == 1),
+        "col": cube & (cube.sum(axis=1, keepdims=True) == 1),
+        "box": cube
+        & np.repeat(
+            np.repeat(cube.reshape(n, 3, 3, 3, 3, 9).sum(axis=(2, 4)) == 1, 3, axis=1),
+            3,
+            axis=2,
+        ),
+    }
+    for name, singles in units.items():
+        singles = singles & open_cells & ~found.any(axis=3, keepdims=True)
+        counts[name] = singles.any(axis=3).sum(axis=(1, 2))
+        found |= singles
+
+    # A cell that is a single for 2 different numbers is a contradiction.
+    # Leave it alone, the contradiction check picks the puzzle out
+    clash = found.sum(axis=3) > 1
+    new_values = np.where(
+        (found.any(axis=3) & ~clash), found.argmax(axis=3) + 1, values
+    ).astype(np.int8)
+    return new_values, counts
+
+
+def broken(cube, values):
+    # An open cell with no candidates, a number with nowhere to go in a unit,
+    # or a number placed twice in a unit
+    answers = placed(values)
+    empty = (values == 0) & ~cube.any(axis=3)
+    twice = (
+        (answers.sum(axis=2) > 1).any(axis=(1, 2))
+        | (answers.sum(axis=1) > 1).any(axis=(1, 2))
+        | (answers.reshape(-1, 3, 3, 3, 3, 9).sum(axis=(2, 4)) > 1).any(axis=(1, 2, 3))
+    )
+    nowhere = (
+        ~cube.any(axis=2).all(axis=(1, 2))
+        | ~cube.any(axis=1).all(axis=(1, 2))
+        | ~box_any(cube).all(axis=(1, 2, 3))
+    )
+    return empty.any(axis=(1, 2)) | twice | nowhere
+
+
+def solve_cube(jobs, search=False):
+    # Takes a list of (name, lines) jobs, returns one record per job in the
+    # same order, with the same fields as 'lib.batch.solve_puzzle'. The time
+    # spent on the cube is split evenly between the puzzles it solved
+    start = time.perf_counter()
+    records = [None] * len(jobs)
+    readable, values = parse_block(jobs)
+    if len(readable) != 0:
+        solve_readable(jobs, readable, values, records)
+    solved = [record for record in records if record is not None]
+    for record in solved:
+        record["elapsed"] = (time.perf_counter() - start) / len(solved)
+
+    for i, record in enumerate(records):
+        if record is None:
+            records[i] = solve_puzzle(jobs[i], search=search)
+    return records
+
+
+def solve_readable(jobs, readable, values, records):
+    index = np.array(readable)
+    cube = eliminate(np.ones(values.shape + (9,), dtype=bool), values)
+    kinds = ("row", "col", "box", "cell", "dagger")
+    deductions = {kind: np.zeros(len(readable), dtype=np.int64) for kind in kinds}
+    # Rows into 'index'/'deductions' of the puzzles still in the cube
+    alive = np.arange(len(readable))
+
+    while len(alive) != 0:
+        before = cube, values
+
+        values, counts = find_singles(cube, values)
+        for kind, count in counts.items():
+            deductions[kind][alive] += count
+        cube = eliminate(cube, values)
+
+        erase = daggers(cube) | daggers(cube.transpose(0, 2, 1, 3)).transpose(0, 2, 1, 3)
+        deductions["dagger"][alive] += erase.sum(axis=(1, 2, 3))
+        cube = cube & ~erase
+
+        # Solved puzzles get their record. Contradictions and puzzles that
+        # didn't move this step go to the per-puzzle solver
+        done = (values != 0).all(axis=(1, 2))
+        bad = broken(cube, values)
+        stuck = (cube == before[0]).all(axis=(1, 2, 3)) & (values == before[1]).all(axis=(1, 2))
+        for row in np.nonzero(done & ~bad)[0]:
+            job = jobs[index[alive[row]]]
+            records[index[alive[row]]] = {
+                "puzzle": job[0],
+                "status": "solved",
+                "grid": "".join(str(v) for v in values[row].ravel()),
+                "search_nodes": 0,
+                "deductions": {
+                    kind: int(deductions[kind][alive[row]])
+                    for kind in kinds
+                    if deductions[kind][alive[row]]
+                },
+            }
+
+        keep = ~(done | bad | stuck)
+        alive = alive[keep]
+        cube = cube[keep]
+        values = values[keep]
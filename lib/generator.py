@@ -0,0 +1,134 @@
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.batch import init_worker
+from lib.cache import SYMMETRIES
+from lib.reader import expand_line
+from lib.search import Search
+from lib.sudoku import BITS, FULL_MASK, PENCILMARK_TECHNIQUES, Sudoku
+
+""" Generate uniquely solvable sudoku puzzles, rated by the techniques they need """
+
+# Every puzzle is made from its own seed, '<seed>:<index>', so a corpus is the
+# same no matter how many processes made it or in what order they finished:
+# * Fill a random grid: the 3 boxes on the diagonal don't share a row or col,
+#   so each gets a random shuffle of 1-9, the search fills in the rest, and
+#   one of the 8 rotations/reflections is applied
+# * Take givens away in a random order, putting back every one whose removal
+#   lets in a second solution. What is left is a minimal puzzle: removing any
+#   one more given makes it ambiguous
+# * Rate it by the easiest tier of techniques that solves it
+
+# Difficulty tiers, easiest first, with the pencilmark techniques each may
+# use. Singles are always on. "expert" puzzles need the search
+TIERS = (
+    ("easy", frozenset()),
+    ("medium", frozenset(("locks", "daggers"))),
+    ("hard", PENCILMARK_TECHNIQUES),
+)
+DIFFICULTIES = tuple(name for name, _ in TIERS) + ("expert",)
+
+
+def puzzle_rng(seed, index):
+    return random.Random(f"{seed}:{index}")
+
+
+def random_solution(rng):
+    values = [0] * 81
+    for box_i in (0, 4, 8):
+        digits = list(range(1, 10))
+        rng.shuffle(digits)
+        for p, digit in enumerate(digits):
+            values[(3 * (box_i // 3) + p // 3) * 9 + 3 * (box_i % 3) + p % 3] = digit
+    search = Search([0] * 81, [FULL_MASK] * 81)
+    for cell, value in enumerate(values):
+        if value:
+            search.assign(search.values, search.masks, cell, value)
+    solution = search.first_solution()
+    perm = rng.choice(SYMMETRIES)
+    return [solution[cell] for cell in perm]
+
+
+def has_other_solution(givens, cell, value):
+    # 'givens' has exactly one solution, with 'value' in 'cell'. Does it still
+    # have only that one once 'cell' is blanked? Only if nothing else fits in
+    # 'cell', so search for a solution with 'value' ruled out there
+    search = Search([0] * 81, [FULL_MASK] * 81)
+    for other, given in enumerate(givens):
+        if given and other != cell:
+            if not search.assign(search.values, search.masks, other, given):
+                return False
+    if search.values[cell]:
+        return False
+    search.masks[cell] &= ~BITS[value]
+    return search.first_solution() is not None
+
+
+def dig(solution, rng):
+    givens = list(solution)
+    cells = list(range(81))
+    rng.shuffle(cells)
+    for cell in cells:
+        value = givens[cell]
+        givens[cell] = 0
+        if has_other_solution(givens, cell, value):
+            givens[cell] = value
+    return givens
+
+
+def rate(givens):
+    # Returns (difficulty, the result of solving it at that difficulty)
+    lines = expand_line("".join(str(value) for value in givens))
+    for name, techniques in TIERS:
+        result = Sudoku(lines, techniques=techniques).solve()
+        if result.status == "solved":
+            return name, result
+    return "expert", Sudoku(lines, search=True).solve()
+
+
+def generate_one(seed, index):
+    rng = puzzle_rng(seed, index)
+    solution = random_solution(rng)
+    givens = dig(solution, rng)
+    difficulty, result = rate(givens)
+    return {
+        "seed": f"{seed}:{index}",
+        "puzzle": "".join(str(value) if value else "." for value in givens),
+        "solution": "".join(str(value) for value in solution),
+        "givens": 81 - givens.count(0),
+        "difficulty": difficulty,
+        "deductions": result.deductions,
+        "search_nodes": result.search_nodes,
+    }
+
+
+def generate_chunk(seed, indexes):
+    return [generate_one(seed, index) for index in indexes]
+
+
+def generate(count, seed=0, difficulty=None, workers=None, chunksize=16):
+    # Yields records until 'count' of them are of 'difficulty' (any
+    # difficulty when None). Puzzle 'index' is tried in order, so the same
+    # arguments always give the same corpus. Like 'lib.batch.solve_batch',
+    # only a couple of chunks per worker are in flight at once
+    workers = workers or os.cpu_count() or 1
+    found = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        in_flight = deque()
+        start = 0
+        while found < count:
+            while len(in_flight) < 2 * workers:
+                indexes = range(start, start + chunksize)
+                in_flight.append(pool.submit(generate_chunk, seed, indexes))
+                start += chunksize
+            for record in in_flight.popleft().result():
+                if difficulty is not None and record["difficulty"] != difficulty:
+                    continue
+                yield record
+                found += 1
+                if found == count:
+                    break
+        for future in in_flight:
+            future.cancel()
@@ -1,40 +1,51 @@
 import logging
 import os
-from pathlib import Path
 
 
-def setup_logging(no_logfile=False):
-    # Create a formatter to define the log message format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
+def default_logfile():
     # Find where to log
     data_root = os.getenv("XDG_DATA_HOME")
     if data_root is None:
         data_root = "./my_data_root"
-    logdir = Path(data_root) / "ebi"
-    logdir.mkdir(exist_ok=True, parents=True)
+    return os.path.join(data_root, "ebi", "ebi.log")
 
-    # Create a file handler to log messages to a file
-    file_handler = logging.FileHandler(logdir / "ebi.log")
-    file_handler.setLevel(
-        logging.DEBUG
-    )  # Set the file handler level to DEBUG to capture all messages
-    file_handler.setFormatter(formatter)
 
-    # Create a stream handler to log info messages and above to stdout
+# Doesn't create the log's directory, or open the log, until there's
+# something to write to it
+class LazyFileHandler(logging.FileHandler):
+    def __init__(self, filename):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def setup_logging(no_logfile=False, level=logging.INFO, logfile=None):
+    # Create a formatter to define the log message format
+    formatter = logging.Formatter(
+        "%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+    # Create a stream handler to log messages at 'level' and above to stdout
     stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(logging.INFO)  # Set the stream handler level to INFO
+    stream_handler.setLevel(level)
     stream_handler.setFormatter(formatter)
 
-    # Get the root logger and set its level to INFO
+    # Get the root logger. Its level is the lowest level any handler wants, so
+    # messages nobody is going to see are dropped before they get formatted
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
+    root_logger.setLevel(level)
+    root_logger.addHandler(stream_handler)
 
-    # Add the handlers to the root logger
     if no_logfile:
-        pass
-    else:
-        root_logger.addHandler(file_handler)
-    root_logger.addHandler(stream_handler)
+        return
+
+    # Create a file handler to log messages to a file
+    file_handler = LazyFileHandler(logfile if logfile is not None else default_logfile())
+    file_handler.setLevel(
+        logging.DEBUG
+    )  # Set the file handler level to DEBUG to capture all messages
+    file_handler.setFormatter(formatter)
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(file_handler)
@@ -0,0 +1,121 @@
+import logging
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+from lib.sudoku import ContradictionError, InvalidPuzzleError, Sudoku, SudokuError, TECHNIQUE_ORDER
+
+""" Race several ways of solving the same puzzle and keep whichever finishes first """
+
+# Which techniques pay off, and in what order, varies a lot from one puzzle to
+# the next, and a bad pick is what makes the slowest puzzles slow. So solve
+# the puzzle once per configuration, each in its own process:
+# * The first one to settle the puzzle wins, and the rest are killed. Solving
+#   it settles it, and so does finding that it contradicts itself
+# * One that stalls doesn't settle anything, another one may still get
+#   further. It is only used if every one of them stalls
+# * One that dies without a result (killed, crashed) counts as failed
+#
+# A configuration is (name, techniques, search). 'techniques' are the
+# pencilmark techniques it uses, in the order it tries them (see 'Sudoku'),
+# and 'search' is whether it may fall back to trial and error at all
+PORTFOLIO = (
+    ("default", TECHNIQUE_ORDER, True),
+    ("singles", (), True),
+    ("intersections-first", ("daggers", "claims", "locks", "hidden", "fish"), True),
+    ("subsets-first", ("hidden", "locks", "daggers", "claims", "fish"), True),
+    ("logic-only", TECHNIQUE_ORDER, False),
+)
+CONFIGS = {config[0]: config for config in PORTFOLIO}
+
+
+def run_config(lines, config, search, sender):
+    # Runs in its own process. Sends one (name, outcome, payload, elapsed)
+    # down 'sender':
+    # * ("solved" or "stalled", (SolveResult, snapshot of the sudoku))
+    # * ("contradiction" or "invalid", the error message)
+    # * ("error", what went wrong)
+    logging.getLogger().setLevel(logging.CRITICAL)
+    name, techniques, config_search = config
+    start = time.perf_counter()
+    try:
+        sudoku = Sudoku(lines, search=search and config_search, techniques=techniques)
+        result = sudoku.solve()
+    except InvalidPuzzleError as e:
+        outcome, payload = "invalid", str(e)
+    except ContradictionError as e:
+        outcome, payload = "contradiction", str(e)
+    except Exception as e:
+        outcome, payload = "error", repr(e)
+    else:
+        outcome, payload = result.status, (result, sudoku.snapshot())
+    sender.send((name, outcome, payload, time.perf_counter() - start))
+    sender.close()
+
+
+def race(lines, configs=PORTFOLIO, search=True):
+    # Returns (name of the winning configuration, its SolveResult, a snapshot
+    # to 'Sudoku.restore' its board from). Raises the winner's error if it
+    # settled the puzzle by finding it can't be solved. With 'search' off, no
+    # configuration falls back to trial and error
+    lines = list(lines)
+    # Configurations that come out the same once 'search' is applied (with it
+    # off, "default" is "logic-only") only need to run once
+    unique = dict()
+    for config in configs:
+        name, techniques, config_search = config
+        unique.setdefault((tuple(techniques), search and config_search), config)
+    configs = list(unique.values())
+
+    # One pipe per configuration. Once a process exits, its end of the pipe
+    # is closed, so one that dies without sending anything still wakes us up
+    readers = dict()
+    processes = list()
+    for config in configs:
+        reader, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=run_config, args=(lines, config, search, sender), daemon=True
+        )
+        process.start()
+        sender.close()
+        readers[reader] = (config[0], process)
+        processes.append(process)
+
+    stalled = None
+    try:
+        while readers:
+            for reader in wait(list(readers)):
+                name, process = readers.pop(reader)
+                try:
+                    name, outcome, payload, elapsed = reader.recv()
+                except EOFError:
+                    process.join()
+                    outcome, elapsed = "error", 0.0
+                    payload = f"exited without a result, exitcode={process.exitcode}"
+                reader.close()
+                logging.debug(f"[PORTFOLIO] Finished | {name=} {outcome=} elapsed={elapsed:.6f}")
+                if outcome == "solved":
+                    logging.info(f"[PORTFOLIO] Won | {name=} elapsed={elapsed:.6f}")
+                    return (name, *payload)
+                if outcome == "invalid":
+                    raise InvalidPuzzleError(payload)
+                if outcome == "contradiction":
+                    logging.info(f"[PORTFOLIO] Won by finding a contradiction | {name=} elapsed={elapsed:.6f}")
+                    raise ContradictionError(payload)
+                if outcome == "error":
+                    logging.warning(f"[PORTFOLIO] A configuration failed | {name=} error={payload}")
+                elif stalled is None:
+                    stalled = (name, *payload)
+    finally:
+        for reader in readers:
+            reader.close()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+    if stalled is None:
+        raise SudokuError(f"[PORTFOLIO] [FAIL] Every configuration failed | configs={len(processes)}")
+    logging.info(f"[PORTFOLIO] Every configuration stalled, keeping the first | name={stalled[0]!r}")
+    return stalled
@@ -0,0 +1,101 @@
+import mmap
+import os
+import sys
+
+from lib.topology import SYMBOLS, order_of
+
+""" Stream sudoku puzzles out of files (or stdin) without loading them whole """
+
+# Files bigger than this get memory-mapped instead of read through a buffer
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# How long a one-puzzle-per-line line is, for each board size: 81 for the
+# usual 9x9, 256 for 16x16, 625 for 25x25
+LINE_SIZES = {size * size: size for size in (4, 9, 16, 25)}
+
+
+def iter_lines(filename):
+    if filename == "-":
+        yield from sys.stdin
+        return
+
+    if os.path.getsize(filename) < MMAP_THRESHOLD:
+        with open(filename) as f:
+            yield from f
+        return
+
+    with open(filename, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                yield line.decode()
+
+
+def expand_line(line):
+    # '4..7.1...' ==> 9 comma-separated rows, the format 'Sudoku' reads.
+    # Bigger boards write 10 and up as 'A', 'B', ... so every value is one
+    # character. Anything else is passed on for 'Sudoku' to complain about
+    size = LINE_SIZES.get(len(line), 9)
+    values = [
+        "0" if c == "." else str(SYMBOLS.index(c) + 1) if c in SYMBOLS else c for c in line
+    ]
+    return [",".join(values[i : i + size]) for i in range(0, size * size, size)]
+
+
+def iter_puzzles(filename):
+    # Understands both formats, even mixed in one file:
+    # * The '*.sudoku' format: 9 lines of 9 comma-separated numbers, 0 for
+    #   blanks. Blocks can be concatenated, blank lines between them are fine.
+    #   A block is as many lines as its first line has numbers, so 16 lines
+    #   of 16 make a 16x16 board
+    # * One puzzle per line: 81 characters, '.' or '0' for blanks (256 or
+    #   625 characters for 16x16 or 25x25, see 'expand_line')
+    # Lines starting with '#' are comments. Yields (name, lines) where 'lines'
+    # is what 'Sudoku' expects to be handed
+    index = 0
+    block = list()
+    block_size = 9
+    for line in iter_lines(filename):
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+
+        if "," not in line and len(line) in LINE_SIZES:
+            if len(block) != 0:
+                # Let 'Sudoku' complain about the half-finished block
+                yield f"{filename}:{index}", block
+                index += 1
+                block = list()
+            yield f"{filename}:{index}", expand_line(line)
+            index += 1
+            continue
+
+        if len(block) == 0:
+            entries = len([l for l in line.split(",") if l != ""])
+            block_size = entries if order_of(entries) else 9
+        block.append(line)
+        if len(block) == block_size:
+            yield f"{filename}:{index}", block
+            index += 1
+            block = list()
+
+    if len(block) != 0:
+        yield f"{filename}:{index}", block
+
+
+def parse_grid(lines):
+    # The 81 numbers of a puzzle in the format 'Sudoku' reads, row by row
+    # with 0 for blanks. Returns None if they aren't 9 rows of 9 numbers from
+    # 0 to 9, 'Sudoku' has the error messages for that. Bigger boards get
+    # None too: what uses this only works on 9x9
+    grid = list()
+    for line in lines:
+        try:
+            row = [int(l) for l in line.strip().split(",") if l != ""]
+        except ValueError:
+            return None
+        if len(row) != 9:
+            return None
+        grid.extend(row)
+    if len(grid) != 81 or any(not 0 <= num <= 9 for num in grid):
+        return None
+    return grid
@@ -0,0 +1,52 @@
+from lib.sudoku import compact_mask
+
+""" Render a board of pencilmarks, redrawing only what changed since last time """
+
+# The board gets rendered after every step in the DEBUG log and in the CLI's
+# "full" output, and between two steps only a handful of cells change. So a
+# renderer remembers the mask it last drew for every cell and the string for
+# every cell and row, and only redraws the cells that changed and the rows
+# they are in.
+#
+# It compares masks rather than trusting the solver's change stamps, so it
+# stays right across 'Sudoku.restore' and can be pointed at any board.
+class BoardRenderer:
+    def __init__(self, size=9):
+        self.size = size
+        self.masks = [None] * (size * size)
+        self.cells = [None] * (size * size)
+        self.rows = [None] * size
+
+    def update(self, candidates):
+        # Returns (cell, mask it was drawn with, mask now) for every cell that
+        # changed since the last update. The first update changes everything
+        drawn = self.masks
+        cells = self.cells
+        changed = [
+            (cell, drawn[cell], mask) for cell, mask in enumerate(candidates) if mask != drawn[cell]
+        ]
+        size = self.size
+        dirty = set()
+        for cell, _, mask in changed:
+            drawn[cell] = mask
+            cells[cell] = compact_mask(mask)
+            dirty.add(cell // size)
+        for row_i in dirty:
+            self.rows[row_i] = "|".join(cells[row_i * size : row_i * size + size]).strip()
+        return changed
+
+    def render(self, candidates):
+        self.update(candidates)
+        return "\n".join(self.rows)
+
+
+def describe_change(change, answers):
+    # "(row_i, col_i): 1-3,7 -> 1,7", or "-> =7" once the cell is answered
+    cell, before, after = change
+    row_i, col_i = divmod(cell, len(answers))
+    before = compact_mask(before).strip() if before is not None else "?"
+    if after == 0 and answers[row_i][col_i] is not None:
+        after = f"={answers[row_i][col_i]}"
+    else:
+        after = compact_mask(after).strip()
+    return f"({row_i}, {col_i}): {before} -> {after}"
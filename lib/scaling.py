@@ -0,0 +1,115 @@
+import math
+import platform
+import random
+import time
+from collections import Counter
+
+from lib.benchmark import percentile, solve_once
+from lib.reader import expand_line
+from lib.topology import topology
+
+""" Measure how solve time grows with the order of the board """
+
+# There is no corpus of 16x16 or 25x25 puzzles to hand, so they are made up:
+# * Fill a grid from the usual pattern, row 'r' of a board of order 'n' is
+#   the row above shifted along by 'n' (by 'n + 1' from one band to the
+#   next), then shuffle the bands, the rows inside each band, the stacks, the
+#   cols inside each stack and the values. Every one of those keeps the grid
+#   valid
+# * Blank a random 'blanks' fraction of the cells
+# Unlike 'lib.generator' nothing checks the puzzle has only one solution, so
+# some stall where a real puzzle wouldn't. They are the same puzzles for the
+# same seed though, so runs can be compared.
+
+
+def shuffled_lines(order, rng):
+    # The rows (or cols) of a board in a random order that keeps each band
+    # (or stack) together
+    bands = list(range(order))
+    rng.shuffle(bands)
+    lines = list()
+    for band in bands:
+        inside = list(range(order))
+        rng.shuffle(inside)
+        lines.extend(band * order + i for i in inside)
+    return lines
+
+
+def pattern_solution(order, rng):
+    size = order * order
+    rows = shuffled_lines(order, rng)
+    cols = shuffled_lines(order, rng)
+    values = list(range(1, size + 1))
+    rng.shuffle(values)
+    return [
+        values[(order * (row_i % order) + row_i // order + col_i) % size]
+        for row_i in rows
+        for col_i in cols
+    ]
+
+
+def order_puzzle(order, rng, blanks=0.3):
+    # One puzzle as a line, the way 'lib.reader.expand_line' reads it
+    symbols = topology(order).symbols
+    return "".join(
+        "." if rng.random() < blanks else symbols[value - 1]
+        for value in pattern_solution(order, rng)
+    )
+
+
+def run_scaling_benchmark(orders, count=20, seed=0, blanks=0.3, search=False):
+    # Solves 'count' puzzles of each order and reports their latencies, and
+    # between one order and the next, how fast the median grew compared to
+    # the number of cells: an exponent of 1 is linear in the cells
+    report = {
+        "python": platform.python_version(),
+        "seed": seed,
+        "count": count,
+        "blanks": blanks,
+        "search": search,
+        "orders": list(),
+        "growth": list(),
+    }
+    for order in orders:
+        board = topology(order)
+        rng = random.Random(f"{seed}:{order}")
+        puzzles = [expand_line(order_puzzle(order, rng, blanks)) for _ in range(count)]
+
+        latencies = list()
+        statuses = Counter()
+        for lines in puzzles:
+            start = time.perf_counter()
+            status, _ = solve_once(lines, search=search)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+        ordered = sorted(latencies)
+        report["orders"].append(
+            {
+                "order": order,
+                "size": f"{board.size}x{board.size}",
+                "cells": board.cells,
+                "puzzles": count,
+                "statuses": dict(statuses),
+                "latency": {
+                    "mean": sum(latencies) / count if count else 0.0,
+                    "p50": percentile(ordered, 50),
+                    "p99": percentile(ordered, 99),
+                    "max": ordered[-1] if ordered else 0.0,
+                },
+            }
+        )
+
+    for before, after in zip(report["orders"], report["orders"][1:]):
+        p50 = before["latency"]["p50"]
+        ratio = after["latency"]["p50"] / p50 if p50 else 0.0
+        cells = after["cells"] / before["cells"]
+        report["growth"].append(
+            {
+                "orders": f"{before['order']} -> {after['order']}",
+                "p50_ratio": ratio,
+                "cells_ratio": cells,
+                "exponent": math.log(ratio) / math.log(cells) if ratio and cells != 1 else 0.0,
+            }
+        )
+    return report
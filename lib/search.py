@@ -0,0 +1,190 @@
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from lib.sudoku import BOARD, OutOfTimeError
+from lib.topology import topology
+
+""" Finish a sudoku by trial and error once the logical techniques stall """
+
+
+# A minimum-remaining-values backtracker. It always branches on the open
+# cell with the fewest pencilmarks left, and after every guess it follows the
+# naked singles the guess uncovers before branching again.
+#
+# 'values' holds the answer for each of the 81 cells (0 when unknown) and
+# 'masks' holds the pencilmark mask for each cell, the same way 'Sudoku'
+# does. Both are copied, never modified in place. 'board' is the topology of
+# bigger boards, where there are more cells than 81.
+class Search:
+    def __init__(self, values, masks, board=BOARD):
+        self.values = list(values)
+        self.masks = list(masks)
+        self.board = board
+        # How many guesses we have made, across every branch we tried
+        self.nodes = 0
+        # An event to give up on as soon as it is set, see
+        # 'count_solutions_in_pool'
+        self.stop = None
+        # A 'time.monotonic()' past which the next guess raises an
+        # 'OutOfTimeError' instead
+        self.deadline = None
+
+    def first_solution(self):
+        for solution in self.solutions():
+            return solution
+        return None
+
+    def solutions(self):
+        yield from self.branch(self.values, self.masks)
+
+    def count_solutions(self, limit=2):
+        # Stops as soon as there are 'limit' of them, which is all a
+        # uniqueness check (limit=2) needs to know
+        found = 0
+        for _ in self.solutions():
+            found += 1
+            if found >= limit:
+                break
+        return found
+
+    def pick_cell(self, values, masks):
+        # The open cell with the fewest pencilmarks, and how many it has.
+        # (None, _) once every cell is filled in
+        mask_size = self.board.mask_size
+        cell = None
+        fewest = self.board.size + 1
+        for c in range(self.board.cells):
+            if values[c]:
+                continue
+            size = mask_size[masks[c]]
+            if size < fewest:
+                cell = c
+                fewest = size
+                if size <= 1:
+                    break
+        return cell, fewest
+
+    def branch(self, values, masks):
+        cell, fewest = self.pick_cell(values, masks)
+        if cell is None:
+            yield values
+            return
+        if fewest == 0:
+            # An open cell with nothing left to put in it
+            return
+
+        stop = self.stop
+        deadline = self.deadline
+        for value in self.board.mask_values[masks[cell]]:
+            if stop is not None and stop.is_set():
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                raise OutOfTimeError(f"[SEARCH] [FAIL] Out of time | nodes={self.nodes}")
+            self.nodes += 1
+            next_values = list(values)
+            next_masks = list(masks)
+            if self.assign(next_values, next_masks, cell, value):
+                yield from self.branch(next_values, next_masks)
+
+    def assign(self, values, masks, cell, value):
+        # Place 'value' and erase it from every peer. Peers left with a single
+        # pencilmark get placed too. Returns False on a contradiction
+        board = self.board
+        mask_size = board.mask_size
+        mask_values = board.mask_values
+        pending = [(cell, value)]
+        while pending:
+            cell, value = pending.pop()
+            if values[cell]:
+                if values[cell] != value:
+                    return False
+                continue
+            bit = board.bits[value]
+            if not masks[cell] & bit:
+                return False
+            values[cell] = value
+            masks[cell] = 0
+            for peer in board.peers[cell]:
+                if values[peer] == value:
+                    return False
+                mask = masks[peer]
+                if not mask & bit:
+                    continue
+                mask ^= bit
+                masks[peer] = mask
+                if mask == 0 and not values[peer]:
+                    return False
+                if mask_size[mask] == 1:
+                    pending.append((peer, mask_values[mask][0]))
+        return True
+
+    def split(self, count):
+        # Guess breadth first until there are at least 'count' branches left
+        # to explore (or none). Returns (how many solutions turned up on the
+        # way, the (values, masks) of every branch left). Each branch is a
+        # search of its own, with no solution in common with the others
+        found = 0
+        pending = deque([(self.values, self.masks)])
+        while pending and len(pending) < count:
+            values, masks = pending.popleft()
+            cell, fewest = self.pick_cell(values, masks)
+            if cell is None:
+                found += 1
+                continue
+            for value in self.board.mask_values[masks[cell]]:
+                self.nodes += 1
+                next_values = list(values)
+                next_masks = list(masks)
+                if self.assign(next_values, next_masks, cell, value):
+                    pending.append((next_values, next_masks))
+        return found, list(pending)
+
+
+# Set in every worker counting branches for 'count_solutions_in_pool', which
+# sets it once it has all the solutions it was after
+stop_counting = None
+
+
+def init_counter(stop):
+    global stop_counting
+    stop_counting = stop
+
+
+def count_branch(order, values, masks, limit):
+    # Runs in a worker. Gets the board's order rather than its 'Topology',
+    # whose lazily filled tables don't pickle. Returns (solutions, nodes)
+    search = Search(values, masks, topology(order))
+    search.stop = stop_counting
+    return search.count_solutions(limit), search.nodes
+
+
+def count_solutions_in_pool(search, limit=2, workers=2):
+    # 'Search.count_solutions' with the branches spread across 'workers'
+    # processes. Each branch is counted up to whatever is still missing when
+    # it is handed out, and as soon as 'limit' is reached the branches not
+    # handed out yet are dropped and the ones being counted give up.
+    # Returns (solutions, nodes)
+    found, branches = search.split(4 * workers)
+    nodes = search.nodes
+    if found >= limit or len(branches) == 0:
+        return min(found, limit), nodes
+
+    order = search.board.order
+    stop = multiprocessing.Event()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_counter, initargs=(stop,)
+    ) as pool:
+        running = set()
+        while (branches or running) and found < limit:
+            while branches and len(running) < 2 * workers:
+                values, masks = branches.pop()
+                running.add(pool.submit(count_branch, order, values, masks, limit - found))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                solutions, branch_nodes = future.result()
+                found += solutions
+                nodes += branch_nodes
+        stop.set()
+    return min(found, limit), nodes
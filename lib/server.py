@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.batch import init_worker, solve_chunk
+from lib.reader import LINE_SIZES, expand_line
+
+""" Solve puzzles for any number of local clients with one warm process pool """
+
+# The protocol is newline-delimited JSON both ways. A request is
+#   {"id": "anything", "puzzle": ..., "search": false}
+# where "puzzle" is either 81 characters ('.' or '0' for blanks, 256 or 625
+# for 16x16 or 25x25), the
+# '*.sudoku' format as one string with a newline after each row, or a list of
+# those rows. "id" and "search" are optional. Every request gets exactly one
+# response: the same record 'batch.py' prints, plus the request's "id".
+# Responses go out as soon as they are ready, so they can come back in a
+# different order than the requests went in.
+#
+# Requests that can't be read get {"status": "error"}, and puzzles a worker
+# spends longer than the timeout on get {"status": "timeout"}.
+
+
+def request_to_job(request, default_name):
+    puzzle = request.get("puzzle")
+    if isinstance(puzzle, str):
+        puzzle = puzzle.strip()
+        if "," not in puzzle and len(puzzle) in LINE_SIZES:
+            lines = expand_line(puzzle)
+        else:
+            lines = puzzle.splitlines()
+    elif isinstance(puzzle, list) and all(isinstance(line, str) for line in puzzle):
+        lines = puzzle
+    else:
+        raise ValueError("'puzzle' must be a string or a list of rows")
+    return str(request.get("id", default_name)), lines
+
+
+def warm_up():
+    return os.getpid()
+
+
+# At most 'max_in_flight' puzzles are being solved at once, across every
+# client. Once that many are out, the server stops reading requests until
+# one finishes, so a client that sends faster than we solve gets pushed back
+# on by its own socket.
+#
+# A puzzle is only handed to the pool once a worker is free for it. The
+# worker itself gives up on it once the timeout has passed (see
+# 'solve_puzzle'), so time spent queued behind other puzzles doesn't count,
+# and a puzzle that runs out of time frees its worker for the next one.
+class SolveServer:
+    def __init__(self, workers=None, max_in_flight=64, timeout=10.0, cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.cache = cache
+        self.pool = None
+        self.slots = None
+        self.idle = None
+        self.served = 0
+
+    async def start(self):
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        self.idle = asyncio.Semaphore(self.workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=init_worker, initargs=(self.cache,)
+        )
+        # Start every worker now, rather than on the first requests
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *[loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)]
+        )
+        logging.info(f"[SERVER] Workers are warm | pids={sorted(set(pids))}")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername") or "unix"
+        logging.info(f"[SERVER] Client connected | {peer=}")
+        lock = asyncio.Lock()
+        tasks = set()
+        count = 0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Backpressure: don't read another request from this client
+                # until there is a slot for this one
+                await self.slots.acquire()
+                task = asyncio.create_task(
+                    self.respond(line, f"{peer}:{count}", writer, lock)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                count += 1
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError as e:
+            logging.warning(f"[SERVER] Client went away | {peer=} {e=}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+        logging.info(f"[SERVER] Client disconnected | {peer=} requests={count}")
+
+    async def respond(self, line, default_name, writer, lock):
+        response = await self.solve(line, default_name)
+        async with lock:
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+    def release(self):
+        self.idle.release()
+        self.slots.release()
+
+    async def solve(self, line, default_name):
+        # Always gives the slot back, once the worker is done with it. An
+        # error reply carries the request's "id" whenever there is one to read
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            job = request_to_job(request, default_name)
+        except ValueError as e:
+            self.slots.release()
+            name = request.get("id") if isinstance(request, dict) else None
+            return {"id": name, "status": "error", "error": str(e)}
+
+        name = job[0]
+        try:
+            await self.idle.acquire()
+        except asyncio.CancelledError:
+            self.slots.release()
+            raise
+        loop = asyncio.get_running_loop()
+        future = self.pool.submit(
+            solve_chunk, [job], bool(request.get("search", False)), timeout=self.timeout
+        )
+        # Runs on the pool's thread, once the worker is done or the pool
+        # dropped the job without running it
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.release))
+        self.served += 1
+        [record] = await asyncio.wrap_future(future)
+        if record["status"] == "timeout":
+            logging.warning(f"[SERVER] Timed out | {name=} timeout={self.timeout}")
+        return {"id": name, **record}
+
+
+async def serve(path=None, host="127.0.0.1", port=8765, **kwargs):
+    # Listens on the unix socket 'path' if it is given, otherwise on TCP
+    server = SolveServer(**kwargs)
+    await server.start()
+    try:
+        if path is not None:
+            listener = await asyncio.start_unix_server(server.handle, path=path)
+        else:
+            listener = await asyncio.start_server(server.handle, host=host, port=port)
+        where = path if path is not None else f"{host}:{port}"
+        logging.info(f"[SERVER] Listening | {where=}")
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+
+
+async def send_puzzles(jobs, path=None, host="127.0.0.1", port=8765, search=False):
+    # The client side: streams (name, lines) jobs to a server and yields the
+    # responses as they come back
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    async def send():
+        sent = 0
+        for name, lines in jobs:
+            request = {"id": name, "puzzle": lines, "search": search}
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            sent += 1
+        return sent
+
+    sender = asyncio.create_task(send())
+    received = 0
+    try:
+        while not sender.done() or received < sender.result():
+            line = await reader.readline()
+            if not line:
+                break
+            received += 1
+            yield json.loads(line)
+        await sender
+    finally:
+        sender.cancel()
+        writer.close()
@@ -0,0 +1,99 @@
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from lib.benchmark import percentile
+
+""" Measure how long the CLI takes to start, and which imports that goes on """
+
+# Every measurement is a fresh interpreter, run the way a user would run it.
+# PYTHONDONTWRITEBYTECODE is dropped from the environment so the modules'
+# bytecode is cached after the warm-up run, like it is on a real install;
+# otherwise every run would pay to compile the whole package again.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_env():
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def run_python(args):
+    # Returns (seconds, stderr)
+    start = time.perf_counter()
+    done = subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        env=child_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return time.perf_counter() - start, done.stderr
+
+
+def parse_importtime(stderr):
+    # '-X importtime' prints "import time: self | cumulative | module" per
+    # module, indented under whatever imported it. Returns a list of
+    # (module, self us, cumulative us, depth)
+    imports = list()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def import_report(imports, top=10):
+    # Everything the CLI imports, and the heaviest top-level imports
+    roots = [entry for entry in imports if entry[3] == 0]
+    return {
+        "modules": len(imports),
+        "total_ms": sum(cumulative for _, _, cumulative, _ in roots) / 1000,
+        "slowest": [
+            {"module": name, "ms": cumulative / 1000}
+            for name, _, cumulative, _ in sorted(roots, key=lambda entry: -entry[2])[:top]
+        ],
+        "loaded": sorted(name for name, _, _, _ in imports),
+    }
+
+
+def run_startup_benchmark(puzzle, repeat=20):
+    # The CLI's wall time to solve one puzzle, next to a bare interpreter's
+    # startup. The difference is what the CLI itself costs
+    cli = ["main.py", "--quiet", "--sudoku_file", puzzle]
+    run_python(cli)
+    bare = sorted(run_python(["-c", "pass"])[0] for _ in range(repeat))
+    wall = sorted(run_python(cli)[0] for _ in range(repeat))
+    _, stderr = run_python(["-X", "importtime", *cli])
+    imports = parse_importtime(stderr)
+    return {
+        "python": platform.python_version(),
+        "puzzle": puzzle,
+        "repeat": repeat,
+        "interpreter": {"p50": percentile(bare, 50), "min": bare[0]},
+        "cli": {"p50": percentile(wall, 50), "min": wall[0]},
+        "overhead": percentile(wall, 50) - percentile(bare, 50),
+        "imports": import_report(imports),
+    }
+
+
+def find_startup_regressions(report, baseline, tolerance=0.2, forbidden=()):
+    # Startup is noisy, so only the overhead on top of a bare interpreter is
+    # compared, and with a looser tolerance than the solver benchmark. Any
+    # 'forbidden' module that got imported is a regression too
+    regressions = list()
+    before = baseline.get("overhead", 0.0) if baseline else 0.0
+    after = report["overhead"]
+    if before and after > before * (1 + tolerance):
+        regressions.append(f"overhead {before * 1000:.1f}ms -> {after * 1000:.1f}ms")
+    loaded = set(report["imports"]["loaded"])
+    for module in forbidden:
+        if module in loaded:
+            regressions.append(f"imports {module}")
+    return regressions
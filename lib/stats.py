@@ -0,0 +1,178 @@
+import time
+from collections import Counter
+
+""" Opt-in instrumentation for a 'Sudoku' solve: timings, counters and a trace """
+
+# Technique name ==> the 'Sudoku' method that implements it
+TECHNIQUES = {
+    "cell": "update_pencilmarks_cell",
+    "row": "update_pencilmarks_row",
+    "col": "update_pencilmarks_col",
+    "box": "update_pencilmarks_box",
+    "locks": "update_pencilmarks_locks",
+    "daggers": "update_pencilmarks_daggers",
+    "claims": "update_pencilmarks_claims",
+    "hidden": "update_pencilmarks_hidden",
+    "fish": "update_pencilmarks_fish",
+    "scan_answers_units": "scan_answers_units",
+    "scan_answers_cells": "scan_answers_cells",
+    "search": "search_for_answers",
+}
+
+# The loops that drive the techniques, timed the same way. 'proceed' calls
+# are the solve's iterations
+STEPS = {
+    "proceed": "proceed",
+    "update_pencilmarks": "update_pencilmarks",
+    "update_pencilmarks_stuck": "update_pencilmarks_stuck",
+}
+
+# The generators that feed the pencilmark techniques. Each candidate
+# they yield is counted, and so is each one that ends up erasing something
+CANDIDATES = {
+    "locks": "identify_locks",
+    "daggers": "identify_daggers",
+    "claims": "identify_claims",
+    "hidden": "identify_hidden",
+    "fish": "identify_fish",
+}
+
+
+# Keeping stats is opt-in. 'instrument' shadows the methods above with
+# wrappers on that one instance, so a 'Sudoku' that isn't being measured runs
+# exactly the code it always did.
+#
+# A technique call "hits" when it made progress: it erased at least one
+# pencilmark, or it returned something truthy (an answer was found, a lock was
+# used). For the pencilmark techniques that is exactly when
+# 'update_pencilmarks' returns True because of them. 'erased' counts the
+# pencilmarks each technique erased.
+#
+# With 'trace' on, every deduction is also recorded as an event:
+#   {"step": proceed iteration, "event": "answer", "technique": ...,
+#    "reason": "row"/"col"/"box"/"cell", "value": ..., "cell": [row, col]}
+#   {"step": proceed iteration, "event": "erase", "technique": ...,
+#    "value": ..., "cell": [row, col]}
+class TechniqueStats:
+    def __init__(self, trace=False):
+        self.calls = Counter()
+        self.hits = Counter()
+        self.erased = Counter()
+        self.seconds = Counter()
+        # "<technique>_candidates" generated vs "<technique>_used"
+        self.counters = Counter()
+        self.trace = list() if trace else None
+        # The technique that is running right now, for the trace
+        self.current = None
+
+    def instrument(self, sudoku):
+        for name, method in {**TECHNIQUES, **STEPS}.items():
+            setattr(sudoku, method, self.timed(sudoku, name, getattr(sudoku, method)))
+        for name, method in CANDIDATES.items():
+            setattr(sudoku, method, self.counted(sudoku, name, getattr(sudoku, method)))
+        if self.trace is not None:
+            sudoku.erase_candidate = self.traced_erase(sudoku, sudoku.erase_candidate)
+            sudoku.log_answer = self.traced_answer(sudoku.log_answer)
+
+    def timed(self, sudoku, name, technique):
+        def wrapper(*args, **kwargs):
+            changes = sudoku.changes
+            previous = self.current
+            self.current = name
+            start = time.perf_counter()
+            try:
+                result = technique(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.current = previous
+            self.calls[name] += 1
+            erased = sudoku.changes - changes
+            self.erased[name] += erased
+            if result or erased:
+                self.hits[name] += 1
+            return result
+
+        return wrapper
+
+    def counted(self, sudoku, name, identify):
+        # A candidate was used if it erased anything by the time the consumer
+        # asked for the next one (or gave up on the rest)
+        def wrapper(*args, **kwargs):
+            for candidate in identify(*args, **kwargs):
+                self.counters[f"{name}_candidates"] += 1
+                changes = sudoku.changes
+                try:
+                    yield candidate
+                finally:
+                    if sudoku.changes != changes:
+                        self.counters[f"{name}_used"] += 1
+
+        return wrapper
+
+    def traced_erase(self, sudoku, erase_candidate):
+        cell_coords = sudoku.board.cell_coords
+
+        def wrapper(value, cell):
+            erased = erase_candidate(value, cell)
+            if erased:
+                self.trace.append(
+                    {
+                        "step": self.calls["proceed"],
+                        "event": "erase",
+                        "technique": self.current,
+                        "value": value,
+                        "cell": list(cell_coords[cell]),
+                    }
+                )
+            return erased
+
+        return wrapper
+
+    def traced_answer(self, log_answer):
+        def wrapper(value, cell_i, reason):
+            self.trace.append(
+                {
+                    "step": self.calls["proceed"],
+                    "event": "answer",
+                    "technique": self.current,
+                    "reason": reason,
+                    "value": value,
+                    "cell": list(cell_i),
+                }
+            )
+            return log_answer(value, cell_i, reason)
+
+        return wrapper
+
+    def merge(self, other):
+        self.calls.update(other.calls)
+        self.hits.update(other.hits)
+        self.erased.update(other.erased)
+        self.seconds.update(other.seconds)
+        self.counters.update(other.counters)
+
+    def as_dict(self):
+        return {
+            name: {
+                "calls": self.calls[name],
+                "hits": self.hits[name],
+                "erased": self.erased[name],
+                "seconds": self.seconds[name],
+            }
+            for name in TECHNIQUES
+        }
+
+    def report(self):
+        # Everything but the trace, ready for 'json.dumps'
+        return {
+            "techniques": self.as_dict(),
+            "steps": {
+                name: {"calls": self.calls[name], "seconds": self.seconds[name]}
+                for name in STEPS
+            },
+            "counters": {
+                key: self.counters[key]
+                for name in CANDIDATES
+                for key in (f"{name}_candidates", f"{name}_used")
+            },
+        }
@@ -1,11 +1,170 @@
 import logging
-import sys
-from itertools import product
-from typing import List
+import time
+from array import array
+from collections import Counter, deque, namedtuple
+
+from lib.topology import order_of, topology
 
 """ Ingest a '*.sudoku' file and load it into a 'Sudoku' object """
 
-Pencilmark = List[int]
+# The solver logs from its hot paths, so messages are handed to 'logging' as
+# %-style arguments and only get formatted when their level is enabled.
+# Anything that renders a whole grid checks the level with this first
+root_logger = logging.getLogger()
+
+# The tables for the usual 9x9 board. Boards of other orders get their own
+# 'Topology', see 'lib.topology' for what each table holds
+BOARD = topology(3)
+FULL_MASK = BOARD.full_mask
+BITS = BOARD.bits
+MASK_SIZE = BOARD.mask_size
+
+
+def compact_pencilmarks(pmarks) -> str:
+    range_all = list()
+    range_one = list()
+    prev_num = -1
+    for num in sorted(pmarks):
+        if num > prev_num + 1:
+            range_all.append([x for x in range_one])
+            range_one = list()
+        range_one.append(num)
+        prev_num = num
+    range_all.append([x for x in range_one])
+    ans = ",".join(
+        [
+            f"{min(x)}-{max(x)}" if min(x) != max(x) else f"{min(x)}"
+            for x in range_all
+            if len(x) > 0
+        ]
+    )
+    if ans == "":
+        blank = "___"
+        return f"{blank:14}"
+    return f"{ans:14}"
+
+
+# There are only 512 possible pencilmark masks on a 9x9 board, so render each
+# of them once. Most runs never render pencilmarks at all, so that happens on
+# first use rather than at import. A mask means the same values whatever the
+# size of the board, so bigger boards share the cache
+COMPACT_PENCILMARKS = dict()
+
+
+def compact_mask(mask):
+    text = COMPACT_PENCILMARKS.get(mask)
+    if text is None:
+        values = [value for value in range(1, mask.bit_length() + 1) if mask & (1 << (value - 1))]
+        text = COMPACT_PENCILMARKS[mask] = compact_pencilmarks(values)
+    return text
+
+
+def naked_subsets(small, fresh=None, mask_size=MASK_SIZE):
+    # 'small' is a list of (position bit, pencilmark mask) for the unsolved
+    # cells of one unit with 2 to 4 pencilmarks. Returns (values mask,
+    # positions mask) for every group of 2, 3 or 4 of them sharing exactly
+    # that many values between them. Cells with more pencilmarks can't be in
+    # a group that small, and larger groups are never needed: the cells left
+    # over in the unit form a smaller one. A group is dropped as soon as its
+    # values outgrow it.
+    #
+    # With 'fresh', only groups including one of the first 'fresh' cells are
+    # returned.
+    #
+    # Nothing here is specific to cells. Handed (value bit, positions mask)
+    # for the values of a unit it finds hidden subsets, and handed (line bit,
+    # positions mask) for one value across the rows or cols it finds fish.
+    # 'mask_size' is the board's, for boards bigger than 9x9
+    found = list()
+    n = len(small)
+    if fresh is None:
+        fresh = n
+    for a in range(min(fresh, n - 1)):
+        bit_a, mask_a = small[a]
+        for b in range(a + 1, n):
+            bit_b, mask_b = small[b]
+            union_b = mask_a | mask_b
+            size = mask_size[union_b]
+            if size == 2:
+                found.append((union_b, bit_a | bit_b))
+                continue
+            if size > 4:
+                continue
+            for c in range(b + 1, n):
+                bit_c, mask_c = small[c]
+                union_c = union_b | mask_c
+                size = mask_size[union_c]
+                if size == 3:
+                    found.append((union_c, bit_a | bit_b | bit_c))
+                    continue
+                if size > 4:
+                    continue
+                for d in range(c + 1, n):
+                    bit_d, mask_d = small[d]
+                    union_d = union_c | mask_d
+                    if mask_size[union_d] == 4:
+                        found.append((union_d, bit_a | bit_b | bit_c | bit_d))
+    return found
+
+
+# The pencilmark techniques a 'Sudoku' can be told to use, on top of singles,
+# in the order they are tried unless told otherwise
+TECHNIQUE_ORDER = ("locks", "daggers", "claims", "hidden", "fish")
+PENCILMARK_TECHNIQUES = frozenset(TECHNIQUE_ORDER)
+
+# What runs each technique: (method, log tag, deductions key, what it found,
+# whether its log lists the updates)
+TECHNIQUE_STEPS = {
+    "locks": ("update_pencilmarks_locks", "LOCK", "lock", "a lock", False),
+    "daggers": ("update_pencilmarks_daggers", "DAGGER", "dagger", "a dagger", True),
+    "claims": ("update_pencilmarks_claims", "CLAIM", "claim", "a claim", True),
+    "hidden": ("update_pencilmarks_hidden", "HIDDEN", "hidden", "a hidden subset", True),
+    "fish": ("update_pencilmarks_fish", "FISH", "fish", "a fish", True),
+}
+
+# Locks and daggers are cheap enough to try after every number placed. The
+# rest wait until there is nothing left to place
+EAGER_TECHNIQUES = frozenset(("locks", "daggers"))
+
+
+class SudokuError(Exception):
+    pass
+
+
+# The input can't be read as a sudoku at all
+class InvalidPuzzleError(SudokuError):
+    pass
+
+
+# The pencilmarks contradict each other, so the puzzle has no solution
+class ContradictionError(SudokuError):
+    pass
+
+
+# The solve was still going when its deadline passed
+class OutOfTimeError(SudokuError):
+    pass
+
+
+# What 'Sudoku.solve' returns:
+# * status: "solved" or "stalled" (we ran out of clues before filling in the
+#   grid)
+# * grid: one character per cell ('1'-'9', then 'A'... on bigger boards), '.'
+#   for cells we have no answer for
+# * deductions: how many times each technique made progress: singles by
+#   "row", "col", "box" and "cell", and pencilmarks erased by "lock",
+#   "dagger", "claim", "hidden" and "fish"
+# * search_nodes, elapsed
+# * solutions: how many solutions 'Sudoku.count_solutions' found, up to its
+#   limit. None for a plain solve
+#
+# A namedtuple rather than a dataclass: 'dataclasses' imports 'inspect',
+# which costs more than the rest of the CLI's startup put together
+SolveResult = namedtuple(
+    "SolveResult",
+    ["status", "grid", "deductions", "search_nodes", "elapsed", "solutions"],
+    defaults=(None, 0, 0.0, None),
+)
 
 
 # The algorithm is simple:
@@ -20,33 +179,114 @@ Pencilmark = List[int]
 #   * Remove some pencilmarks
 #     * There is a 'lock' in a line
 #     * There is a 'lock' in a box
+#     * There is a 'dagger' or a 'claim' where a box and a line cross
+#     * There is a 'hidden' subset in a line or a box
+#     * There is a 'fish' across several rows or cols
+#
+# Everything a solve touches lives on the instance, so one process can work
+# through any number of puzzles, and 'snapshot'/'restore' can rewind one.
+#
+# The board is 9x9 unless 'order' says otherwise (4 for 16x16, 5 for 25x25).
+# Left out, the order is worked out from the number of rows in '_data'. Every
+# table the techniques look things up in comes from 'self.board'.
 class Sudoku:
-    pencilmarks = None
-    box_numbers = None
-    initial_puzzle = None
-    answers = [[None for _ in range(9)] for _ in range(9)]
-    used_locks = set()
-    used_daggers = set()
-
-    def __init__(self, _data):
-        # Init caches for "advanced technique"s
-        self.used_locks = set()
-        self.used_daggers = set()
-
-        # Make a 9 by 9 grid, each of which contains a pencilmarked_cell
-        self.pencilmarks = [
-            [self.full_pencilmarked_cell() for _ in range(1, 10)] for i in range(1, 10)
-        ]
+    candidates = None
+    stats = None
+    renderer = None
+    # (limit, workers) while 'count_solutions' is running, and what it found
+    counting = None
+    solutions = None
+    deadline = None
+
+    def __init__(
+        self, _data, search=False, stats=False, trace=False, techniques=None, order=None, deadline=None
+    ):
+        _data = list(_data)
+        if order is None:
+            order = order_of(len([line for line in _data if line.strip()])) or 3
+        self.board = board = topology(order)
+
+        # Time each technique and count its hits, and with 'trace' record an
+        # event per deduction too. Only the instances that ask for it pay for it
+        if stats or trace:
+            from lib.stats import TechniqueStats
+
+            self.stats = TechniqueStats(trace=trace)
+            self.stats.instrument(self)
+
+        # Fall back to trial and error once we are out of clues, and keep
+        # track of how many guesses that took
+        self.search = search
+        # A 'time.monotonic()' to give up at, with an 'OutOfTimeError'. The
+        # search checks it before every guess, the rest before every step
+        self.deadline = deadline
+        # Which of the pencilmark techniques beyond singles to use. All of
+        # them unless told otherwise. A list or tuple also says what order to
+        # try them in, a set keeps the usual order
+        self.techniques = PENCILMARK_TECHNIQUES if techniques is None else frozenset(techniques)
+        unknown = self.techniques - PENCILMARK_TECHNIQUES
+        if unknown:
+            raise SudokuError(f"[INIT] [FAIL] Unknown techniques | {sorted(unknown)=}")
+        if techniques is None or isinstance(techniques, (set, frozenset)):
+            techniques = TECHNIQUE_ORDER
+        self.technique_order = tuple(t for t in dict.fromkeys(techniques) if t in self.techniques)
+        self.eager_order = tuple(t for t in self.technique_order if t in EAGER_TECHNIQUES)
+        self.search_nodes = 0
+        self.deductions = Counter()
+
+        size = board.size
+        self.answers = [[None for _ in range(size)] for _ in range(size)]
+
+        # Make a size by size grid, each of which contains a
+        # pencilmarked_cell. Keep a "where can digit d go" mask per unit
+        # alongside it, indexed by 'unit_i * stride + d'
+        self.candidates = array(board.typecode, [self.full_pencilmarked_cell()]) * board.cells
+        self.places = array(board.typecode, [board.full_mask]) * (board.units * board.stride)
+        # The values each unit has an answer for. A value with no place left
+        # in a unit is only a contradiction if it isn't one of them
+        self.unit_answers = array(board.typecode, [0]) * board.units
+
+        # Every erased pencilmark bumps 'changes' and stamps the units it
+        # touched with it. Techniques remember the stamp they last saw per
+        # unit, so they only revisit rows/cols/boxes that moved since
+        self.changes = 0
+        self.unit_changes = array("q", [0]) * board.units
+        self.daggers_seen = array("q", [-1]) * size
+        # The "where can value v go" mask of every box as daggers last saw it.
+        # Only values whose mask moved since can make a new dagger. And the
+        # values each box already made a dagger for: once a value is stuck in
+        # one segment it stays there, so it never makes another
+        self.dagger_places = array(board.typecode, [0]) * (size * board.stride)
+        self.used_daggers = array(board.typecode, [0]) * size
+        self.claims_seen = array("q", [-1]) * (2 * size)
+        self.hidden_seen = array("q", [-1]) * board.units
+        # The same stamp per value, for the techniques that look at one value
+        # across the whole board
+        self.digit_changes = array("q", [0]) * board.stride
+        self.fish_seen = array("q", [-1]) * board.stride
+        # Cells that got down to 4 pencilmarks or fewer since locks last
+        # looked. Only those can make up a new lock
+        self.subset_cells = list()
+
+        # Singles are queued by 'erase_candidate' the moment they show up:
+        # (unit_i, value) when a value has one place left in a unit, and the
+        # cell index when a cell has one pencilmark left
+        self.hidden_singles = deque()
+        self.naked_singles = deque()
 
         # Load all the original numbers into the 'box_numbers' queue for later processing
-        self.box_numbers = list()
+        self.box_numbers = deque()
         self.initial_puzzle = list()
         for line in _data:
             row_str = [l for l in line.strip().split(",") if l != ""]
             row = self.validate_row(row_str)
-            self.box_numbers.append([r for r in row])
             self.initial_puzzle.append([r for r in row])
         self.validate_input()
+        self.validate_givens()
+        for row_i, row in enumerate(self.initial_puzzle):
+            for col_i, value in enumerate(row):
+                if value != 0:
+                    self.box_numbers.append((row_i, col_i, value))
 
         # Now go through all the original box numbers and update the
         # pencilmarks. Find the next box number. Pop it off and process it
@@ -57,20 +297,123 @@ class Sudoku:
             *cell_i, value = self.pop_box_number()
             if value is None:
                 break
-            logging.info(f"Placing a value into the cell because it is part of the original puzzle | {value=} {cell_i=}")
+            logging.info(
+                "Placing a value into the cell because it is part of the original puzzle | value=%r cell_i=%r",
+                value,
+                cell_i,
+            )
             while self.update_pencilmarks(value, cell_i, no_daggers=True, no_locks=True):
                 pass
             self.answers[cell_i[0]][cell_i[1]] = value
         logging.info(f"[INIT] complete")
 
+    # Everything that changes while solving. A snapshot holds its own copies,
+    # so it can be restored any number of times
+    def snapshot(self):
+        return (
+            self.candidates[:],
+            self.places[:],
+            self.unit_answers[:],
+            self.changes,
+            self.unit_changes[:],
+            self.daggers_seen[:],
+            self.dagger_places[:],
+            self.used_daggers[:],
+            self.claims_seen[:],
+            self.hidden_seen[:],
+            self.digit_changes[:],
+            self.fish_seen[:],
+            tuple(self.subset_cells),
+            tuple(self.hidden_singles),
+            tuple(self.naked_singles),
+            tuple(self.box_numbers),
+            [row[:] for row in self.answers],
+            Counter(self.deductions),
+            self.search_nodes,
+        )
+
+    def restore(self, snapshot):
+        (
+            candidates,
+            places,
+            unit_answers,
+            self.changes,
+            unit_changes,
+            daggers_seen,
+            dagger_places,
+            used_daggers,
+            claims_seen,
+            hidden_seen,
+            digit_changes,
+            fish_seen,
+            subset_cells,
+            hidden_singles,
+            naked_singles,
+            box_numbers,
+            answers,
+            deductions,
+            self.search_nodes,
+        ) = snapshot
+        self.candidates = candidates[:]
+        self.places = places[:]
+        self.unit_answers = unit_answers[:]
+        self.unit_changes = unit_changes[:]
+        self.daggers_seen = daggers_seen[:]
+        self.dagger_places = dagger_places[:]
+        self.used_daggers = used_daggers[:]
+        self.claims_seen = claims_seen[:]
+        self.hidden_seen = hidden_seen[:]
+        self.digit_changes = digit_changes[:]
+        self.fish_seen = fish_seen[:]
+        self.subset_cells = list(subset_cells)
+        self.hidden_singles = deque(hidden_singles)
+        self.naked_singles = deque(naked_singles)
+        self.box_numbers = deque(box_numbers)
+        self.answers = [row[:] for row in answers]
+        self.deductions = Counter(deductions)
+
+    # A new, independent Sudoku in the same state as this one, without going
+    # through the puzzle input again
+    def clone(self):
+        other = Sudoku.__new__(Sudoku)
+        other.board = self.board
+        other.search = self.search
+        other.deadline = self.deadline
+        other.techniques = self.techniques
+        other.technique_order = self.technique_order
+        other.eager_order = self.eager_order
+        other.initial_puzzle = self.initial_puzzle
+        other.restore(self.snapshot())
+        return other
+
     def validate_input(self):
-        if len(self.box_numbers) != 9:
-            raise Exception("[SUDOKU] - We need 9 rows to make a valid sudoku")
+        size = self.board.size
+        if len(self.initial_puzzle) != size:
+            raise InvalidPuzzleError(f"[SUDOKU] - We need {size} rows to make a valid sudoku")
+
+    # The same value given twice in a row, col or box can't be solved. One
+    # pass over the givens, so a bad puzzle is turned away before any
+    # pencilmark gets touched
+    def validate_givens(self):
+        board = self.board
+        seen = [0] * board.units
+        for row_i, row in enumerate(self.initial_puzzle):
+            for col_i, value in enumerate(row):
+                if value == 0:
+                    continue
+                bit = board.bits[value]
+                for unit_i, _ in board.cell_units[row_i * board.size + col_i]:
+                    if seen[unit_i] & bit:
+                        raise ContradictionError(
+                            f"[SUDOKU] - The same value is given twice in a {board.unit_names[unit_i]} - {value=} cell_i={(row_i, col_i)}"
+                        )
+                    seen[unit_i] |= bit
 
     def validate_row(self, row_str):
-        if len(row_str) != 9:
-            raise Exception(
-                f"[SUDOKU] - We need 9 columns per rows to make a valid sudoku - {row_str=}"
+        size = self.board.size
+        if len(row_str) != size:
+            raise InvalidPuzzleError(
+                f"[SUDOKU] - We need {size} columns per rows to make a valid sudoku - {row_str=}"
             )
         try:
             for string in row_str:
@@ -78,156 +421,252 @@ class Sudoku:
                 if num == 0:
                     # This cell is blank
                     continue
-                if not 1 <= num <= 9:
-                    raise Exception(
-                        f"[SUDOKU] - We need a number between 1 and 9 - {num=} {row_str=}"
+                if not 1 <= num <= size:
+                    raise InvalidPuzzleError(
+                        f"[SUDOKU] - We need a number between 1 and {size} - {num=} {row_str=}"
                     )
         except ValueError:
-            raise Exception(
-                f"[SUDOKU] - Failed to convert value to number between 1 and 9 inclusive - {string=} {row_str=}"
+            raise InvalidPuzzleError(
+                f"[SUDOKU] - Failed to convert value to number between 1 and {size} inclusive - {string=} {row_str=}"
             )
         return [int(string) for string in row_str]
 
-    def full_pencilmarked_cell(self) -> List[int]:
-        return [i for i in range(1, 10)]
-
-    def compact_pencilmarks(self, pmarks) -> str:
-        range_all = list()
-        range_one = list()
-        prev_num = -1
-        pmarks.sort()
-        for num in pmarks:
-            if num > prev_num + 1:
-                range_all.append([x for x in range_one])
-                range_one = list()
-            range_one.append(num)
-            prev_num = num
-        range_all.append([x for x in range_one])
-        ans = ",".join(
-            [
-                f"{min(x)}-{max(x)}" if min(x) != max(x) else f"{min(x)}"
-                for x in range_all
-                if len(x) > 0
-            ]
-        )
-        if ans == "":
-            blank = "___"
-            return f"{blank:14}"
-        return f"{ans:14}"
+    def full_pencilmarked_cell(self) -> int:
+        return self.board.full_mask
+
+    def get_pencilmarks(self, cell_i) -> list:
+        row_i, col_i = cell_i
+        board = self.board
+        return list(board.mask_values[self.candidates[row_i * board.size + col_i]])
 
     def __str__(self):
-        if self.pencilmarks is None:
+        if self.candidates is None:
             return "Not initialized"
 
-        return "\n".join(
-            [
-                "|".join([self.compact_pencilmarks(cell) for cell in row]).strip()
-                for row in self.pencilmarks
-            ]
-        )
+        # Rendered after every step in the DEBUG log, so only the rows that
+        # changed since last time get redrawn
+        if self.renderer is None:
+            from lib.render import BoardRenderer
+
+            self.renderer = BoardRenderer(self.board.size)
+        return self.renderer.render(self.candidates)
 
     def pop_box_number(self):
-        row_i = None
-        col_i = None
-        value = None
-        for row_i in range(len(self.box_numbers)):
-            for col_i in range(len(self.box_numbers[row_i])):
-                value = self.box_numbers[row_i][col_i]
-                # None means we have checked the number in this box already
-                # 0 means this box is blank
-                # 1-9 means this box has an answer and it is pending
-                if value is not None and value != 0:
-                    self.box_numbers[row_i][col_i] = None
-                    self.answers[row_i][col_i] = value
-                    return row_i, col_i, value
-        return None, None, None
+        # Everything in the queue has an answer and it is pending
+        if not self.box_numbers:
+            return None, None, None
+        row_i, col_i, value = self.box_numbers.popleft()
+        self.record_answer(row_i, col_i, value)
+        return row_i, col_i, value
+
+    def record_answer(self, row_i, col_i, value):
+        self.answers[row_i][col_i] = value
+        board = self.board
+        bit = board.bits[value]
+        unit_answers = self.unit_answers
+        unit_answers[row_i] |= bit
+        unit_answers[board.size + col_i] |= bit
+        unit_answers[2 * board.size + board.cell_box[row_i * board.size + col_i]] |= bit
+
+    def solve(self, on_step=None) -> SolveResult:
+        # Drain the queues. Each step places one number, which only touches
+        # the pencilmarks of its peers, and any single that uncovers is
+        # already waiting to be placed by the next step. 'on_step' is called
+        # with the sudoku after every step
+        start = time.perf_counter()
+        deadline = self.deadline
+        while not self.proceed():
+            if on_step is not None:
+                on_step(self)
+            if deadline is not None and time.monotonic() > deadline:
+                raise OutOfTimeError(
+                    f"[SOLVE] [FAIL] Out of time | elapsed={time.perf_counter() - start:.6f}"
+                )
+        return SolveResult(
+            status="solved" if self.is_solved() else "stalled",
+            grid=self.compact_answers(),
+            deductions=dict(self.deductions),
+            search_nodes=self.search_nodes,
+            elapsed=time.perf_counter() - start,
+            solutions=self.solutions,
+        )
+
+    def count_solutions(self, limit=2, workers=1, on_step=None) -> SolveResult:
+        # Solve as far as the logical techniques go, then count the ways to
+        # fill in what they left, stopping at 'limit' (2 is all a uniqueness
+        # check needs). Only the pencilmarks left standing get guessed at, so
+        # the count starts from a much smaller tree than the bare givens.
+        # With 'workers' > 1 its branches are counted in that many processes
+        start = time.perf_counter()
+        self.counting = (limit, workers)
+        try:
+            return self.solve(on_step=on_step)
+        except ContradictionError as e:
+            logging.info(f"[COUNT] The puzzle contradicts itself, so it has no solution | {e}")
+            self.solutions = 0
+            return SolveResult(
+                status="stalled",
+                grid=self.compact_answers(),
+                deductions=dict(self.deductions),
+                search_nodes=self.search_nodes,
+                elapsed=time.perf_counter() - start,
+                solutions=0,
+            )
+        finally:
+            self.counting = None
 
     def proceed(self):
-        # Given pencilmarks, discover new answers to add
+        # Given pencilmarks, discover a new answer to add
         self.scan_answers()
 
         # Now that we've updated everything and added new box numbers, find the
         # next unprocessed box number and update pencilmarks with it
         *cell_i, value = self.pop_box_number()
         if value is None:
+            if self.update_pencilmarks_stuck():
+                return False
             self.endgame()
             return True
         logging.debug(
-            f"[PENCILMARKS] We have a box number to deal with | {cell_i=} {value=}"
+            "[PENCILMARKS] We have a box number to deal with | cell_i=%r value=%r",
+            cell_i,
+            value,
         )
         while self.update_pencilmarks(value, cell_i):
             pass
 
     def erase_pencilmark(self, value, cell_i):
         row_i, col_i = cell_i
-        self.pencilmarks[row_i][col_i] = [
-            x for x in self.pencilmarks[row_i][col_i] if x != value
-        ]
+        return self.erase_candidate(value, row_i * self.board.size + col_i)
+
+    # Every pencilmark removal funnels through here so that the per-unit
+    # "where can digit d go" masks stay in sync with the cell masks
+    def erase_candidate(self, value, cell):
+        board = self.board
+        bit = board.bits[value]
+        mask = self.candidates[cell]
+        if not mask & bit:
+            return False
+        mask ^= bit
+        self.candidates[cell] = mask
+        mask_size = board.mask_size
+        if mask_size[mask] <= 1:
+            # A cell runs out of pencilmarks once it has an answer, and
+            # otherwise only when the puzzle can't be solved
+            if mask:
+                self.naked_singles.append(cell)
+            else:
+                row_i, col_i = board.cell_coords[cell]
+                if self.answers[row_i][col_i] is None:
+                    raise ContradictionError(
+                        f"[PENCILMARKS] [FAIL] There is nothing left to put in a cell | cell_i={(row_i, col_i)} {value=}"
+                    )
+        self.changes += 1
+        changes = self.changes
+        self.digit_changes[value] = changes
+        places = self.places
+        unit_changes = self.unit_changes
+        stride = board.stride
+        for unit_i, position in board.cell_units[cell]:
+            positions = places[unit_i * stride + value] ^ position
+            places[unit_i * stride + value] = positions
+            unit_changes[unit_i] = changes
+            if mask_size[positions] <= 1:
+                if positions:
+                    self.hidden_singles.append((unit_i, value))
+                elif not self.unit_answers[unit_i] & bit:
+                    raise ContradictionError(
+                        f"[PENCILMARKS] [FAIL] There is nowhere left to put a value in a {board.unit_names[unit_i]} | {unit_i=} {value=}"
+                    )
+        if mask_size[mask] <= 4:
+            self.subset_cells.append(cell)
+        return True
 
     def update_pencilmarks(self, value, cell_i, no_daggers=False, no_locks=False):
         row_i, col_i = cell_i
-        original = self.hash_pencilmarks()
+        original = self.changes
 
         self.update_pencilmarks_cell(cell_i)
-        if self.hash_pencilmarks() != original:
-            logging.debug(f"[PENCILMARKS] [CELL] We have updated pencilmarks because of cell | {cell_i=}")
+        if self.changes != original:
+            logging.debug("[PENCILMARKS] [CELL] We have updated pencilmarks because of cell | cell_i=%r", cell_i)
             self.log_pencilmarks()
             return True
 
         self.update_pencilmarks_row(value, row_i)
-        if self.hash_pencilmarks() != original:
-            logging.debug(f"[PENCILMARKS] [ROW] We have updated pencilmarks because of row | {value=} {cell_i=}")
+        if self.changes != original:
+            logging.debug("[PENCILMARKS] [ROW] We have updated pencilmarks because of row | value=%r cell_i=%r", value, cell_i)
             self.log_pencilmarks()
             return True
 
         self.update_pencilmarks_col(value, col_i)
-        if self.hash_pencilmarks() != original:
-            logging.debug(f"[PENCILMARKS] [COL] We have updated pencilmarks because of col | {value=} {cell_i=}")
+        if self.changes != original:
+            logging.debug("[PENCILMARKS] [COL] We have updated pencilmarks because of col | value=%r cell_i=%r", value, cell_i)
             self.log_pencilmarks()
             return True
 
         self.update_pencilmarks_box(value, cell_i)
-        if self.hash_pencilmarks() != original:
-            logging.debug(f"[PENCILMARKS] [BOX] We have updated pencilmarks because of box | {value=} {cell_i=}")
+        if self.changes != original:
+            logging.debug("[PENCILMARKS] [BOX] We have updated pencilmarks because of box | value=%r cell_i=%r", value, cell_i)
             self.log_pencilmarks()
             return True
 
-        if not no_locks:
-            self.update_pencilmarks_locks()
-            if self.hash_pencilmarks() != original:
-                logging.debug(f"[PENCILMARKS] [LOCK] We have updated pencilmarks because of a lock")
-                self.log_pencilmarks()
+        if no_locks and no_daggers:
+            return False
+        for name in self.eager_order:
+            if no_locks and name == "locks" or no_daggers and name == "daggers":
+                continue
+            if self.apply_technique(name):
                 return True
 
-        if not no_daggers:
-            updates = self.update_pencilmarks_daggers()
-            if len(updates) != 0:
-                logging.debug(f"[PENCILMARKS] [DAGGER] We have updated pencilmarks because of a dagger | {updates=}")
-                self.log_pencilmarks()
-                return True
+        return False
 
+    # Claims, hidden subsets and fish look at far more of the board than the
+    # techniques above, so they only run once there is nothing left to place.
+    # Whatever they erase can make a lock or a dagger, so every technique gets
+    # another look each time, in 'technique_order' (locks and daggers first
+    # unless told otherwise)
+    def update_pencilmarks_stuck(self):
+        for name in self.technique_order:
+            if self.apply_technique(name):
+                return True
         return False
 
+    def apply_technique(self, name):
+        # Run one pencilmark technique, returning whether it erased anything
+        method, tag, _, found, log_updates = TECHNIQUE_STEPS[name]
+        updates = getattr(self, method)()
+        if len(updates) == 0:
+            return False
+        if log_updates:
+            logging.debug("[PENCILMARKS] [%s] We have updated pencilmarks because of %s | updates=%r", tag, found, updates)
+        else:
+            logging.debug("[PENCILMARKS] [%s] We have updated pencilmarks because of %s", tag, found)
+        self.log_pencilmarks()
+        return True
+
+    def update_pencilmarks_unit(self, value, unit_i):
+        # Only visit the cells that still have 'value' pencilmarked
+        board = self.board
+        cells = board.unit_cells[unit_i]
+        for position in board.mask_positions[self.places[unit_i * board.stride + value]]:
+            self.erase_candidate(value, cells[position])
+
     def update_pencilmarks_row(self, value, row_i):
-        for col_i in range(9):
-            self.erase_pencilmark(value, (row_i, col_i))
+        self.update_pencilmarks_unit(value, row_i)
 
     def update_pencilmarks_col(self, value, col_i):
-        for row_i in range(9):
-            self.erase_pencilmark(value, (row_i, col_i))
+        self.update_pencilmarks_unit(value, self.board.size + col_i)
 
     def update_pencilmarks_box(self, value, cell_i):
-        row_i, col_i = cell_i
         box_i = self.get_box_i_from_cell(cell_i)
-        row_start = 3 * int(box_i / 3)
-        col_start = 3 * int(box_i % 3)
-        for row_i in range(row_start, row_start + 3):
-            for col_i in range(col_start, col_start + 3):
-                self.erase_pencilmark(value, (row_i, col_i))
+        self.update_pencilmarks_unit(value, 2 * self.board.size + box_i)
 
     def update_pencilmarks_cell(self, cell_i):
         row_i, col_i = cell_i
-        self.pencilmarks[row_i][col_i] = list()
+        board = self.board
+        cell = row_i * board.size + col_i
+        for value in board.mask_values[self.candidates[cell]]:
+            self.erase_candidate(value, cell)
 
     # This function takes us from weeny-hut jr to the salty spitoon.
     #
@@ -235,110 +674,102 @@ class Sudoku:
     # in that line cannot have either of their values, so we can use this to
     # clear pencilmarks
     def update_pencilmarks_locks(self):
-        did_work = False
+        updates = list()
         for lock in self.identify_locks():
-            did_work = True
             orientation, values, cells = lock
             logging.debug(
-                f"[PENCILMARKS] [LOCK] [IDENTIFY] We found a lock | {orientation=} {values=}, {cells=}"
+                "[PENCILMARKS] [LOCK] [IDENTIFY] We found a lock | orientation=%r values=%r, cells=%r",
+                orientation,
+                values,
+                cells,
             )
 
-            # Destructure the answer
-            row = list()
-            col = list()
-            for cell in cells:
-                row.append(cell[0])
-                col.append(cell[1])
-
-            if orientation == "row":
-                row_i = row[0]
-                for col_i in [c for c in range(9) if c not in col]:
-                    for value in values:
-                        reason = f"lock in row {cells=} have {values}"
-                        cell_i = (row_i, col_i)
-                        self.log_pencilmark_lock(value, cell_i, reason)
-                        self.erase_pencilmark(value, cell_i)
-            elif orientation == "col":
-                col_i = col[0]
-                for row_i in [r for r in range(9) if r not in row]:
-                    for value in values:
-                        reason = f"lock in col {cells=} have {values}"
-                        cell_i = (row_i, col_i)
-                        self.log_pencilmark_lock(value, cell_i, reason)
-                        self.erase_pencilmark(value, cell_i)
-            elif orientation == "box":
-                cell_in_relevant_box = (row[0], col[0])
-                for cell_i in [
-                    ci
-                    for ci in self.get_box_range_from_cell(cell_in_relevant_box)
-                    if ci not in cells
-                ]:
-                    for value in values:
-                        reason = f"lock in box {cells=} have {values}"
-                        self.log_pencilmark_lock(value, cell_i, reason)
-                        self.erase_pencilmark(value, cell_i)
-            else:
-                logging.error(
+            if orientation not in self.board.unit_offsets:
+                raise SudokuError(
                     f"[PENCILMARKS] [LOCK] [FAIL] Unknown orientation from 'identify_locks' | {orientation=}"
                 )
-                sys.exit(1)
-        return did_work
 
-    def log_pencilmark_lock(self, value, cell_i, reason):
-        # logging.debug(f"[PENCILMARKS] [LOCK] [ERASE] [ATTEMPT] | {value=} {cell_i=} {reason=}")
-        row_i, col_i = cell_i
-        if value in self.pencilmarks[row_i][col_i]:
-            logging.info(f"[PENCILMARKS] [LOCK] [ERASE] | {value=} {cell_i=} {reason=}")
+            # Every other cell in the lock's unit loses the lock's values
+            unit_i = self.get_unit_i_from_cell(orientation, cells[0])
+            reason = f"lock in {orientation} {cells=} have {values}"
+            for cell_i in self.board.unit_coords[unit_i]:
+                if cell_i in cells:
+                    continue
+                for value in values:
+                    if self.erase_pencilmark_from("locks", value, cell_i, reason):
+                        updates.append((reason, cell_i))
+        return updates
 
-    def hash_lockcell(self, lockcell):
-        orientation, index, pencilmarks, _ = lockcell
-        pm_hash = "_".join([str(p) for p in pencilmarks])
-        hashme = tuple((orientation, pm_hash, index))
-        return hash(hashme)
+    # Erase a pencilmark on behalf of one of the pencilmark techniques, if it
+    # is still there. Returns whatever 'erase_candidate' does
+    def erase_pencilmark_from(self, technique, value, cell_i, reason):
+        row_i, col_i = cell_i
+        board = self.board
+        cell = row_i * board.size + col_i
+        if not self.candidates[cell] & board.bits[value]:
+            return False
+        _, tag, key, _, _ = TECHNIQUE_STEPS[technique]
+        logging.info("[PENCILMARKS] [%s] [ERASE] | value=%r cell_i=%r reason=%r", tag, value, cell_i, reason)
+        self.deductions[key] += 1
+        return self.erase_candidate(value, cell)
 
     def identify_locks(self):
-        # Make a tree-style data structure.
-        # 1st layer: index ==> row, col, box & WHICH rcb it is
-        # 2nd layer: index ==> len(pencilmarks)
-        # 3rd layer: index ==> hash(pencilmarks)
-        # Value: cell_i
-        #
-        # If we ever get a collision, then we have a lock. Return it as:
+        # A lock is a naked subset: 'k' open cells of one unit whose
+        # pencilmarks, taken together, are only 'k' values. The cells don't
+        # need identical pencilmarks, {1,2},{2,3},{1,3} is a lock on 1, 2 and
+        # 3. Return it as:
         # ORIENTATION, PENCILMARKS, [CELL_I]
         #
-        # An alternative way to do this is to just hash all those indexing values...
-        lockbox = dict()
-        for cell_i in product(range(9), range(9)):
-            row_i, col_i = cell_i
-            pencilmarks = self.pencilmarks[row_i][col_i]
-            box_i = self.get_box_i_from_cell(cell_i)
-            for lockcell in [
-                ("row", row_i, pencilmarks, cell_i),
-                ("col", col_i, pencilmarks, cell_i),
-                ("box", box_i, pencilmarks, cell_i),
-            ]:
-                my_hash = self.hash_lockcell(lockcell)
-                if lockbox.get(my_hash) == None:
-                    lockbox[my_hash] = list()
-                lockbox[my_hash].append(lockcell)
-
-        # Check for any colissions ==> it is a lock
-        for key, lockcell_list in lockbox.items():
-            orientation, _, pencilmarks, cell_i = lockcell_list[0]
-
-            # Don't use this lock if it doesn't make sense to
-            if not 2 <= len(lockcell_list) <= 3:
-                continue
-            if len(lockcell_list) != len(pencilmarks):
+        # A lock made of cells that didn't change since we last looked was
+        # already found back then, so only the units of cells that changed
+        # get searched, and only for locks that include one of those cells. A
+        # lock is only returned while the rest of its unit still has one of
+        # its values to erase, so none is ever handed out twice
+        board = self.board
+        mask_size = board.mask_size
+        mask_values = board.mask_values
+        mask_positions = board.mask_positions
+        position_bits = board.position_bits
+        stride = board.stride
+        candidates = self.candidates
+        places = self.places
+        fresh_units = dict()
+        for cell in set(self.subset_cells):
+            if mask_size[candidates[cell]] < 2:
                 continue
-
-            # Make sure to only use this lock once.
-            if key in self.used_locks:
+            for unit_i, position in board.cell_units[cell]:
+                fresh_units[unit_i] = fresh_units.get(unit_i, 0) | position
+        self.subset_cells = list()
+
+        for unit_i in sorted(fresh_units):
+            changed = fresh_units[unit_i]
+            # Changed cells go first
+            cells = board.unit_cells[unit_i]
+            small = [
+                (position_bits[position], candidates[cells[position]])
+                for position in mask_positions[changed]
+            ]
+            fresh = len(small)
+            small += [
+                (bit, mask)
+                for bit, cell in zip(position_bits, cells)
+                if not bit & changed and 2 <= mask_size[mask := candidates[cell]] <= 4
+            ]
+            if len(small) < 2:
                 continue
-            self.used_locks.add(key)
+            for mask, positions in naked_subsets(small, fresh, mask_size):
+                # Is any of its values still pencilmarked elsewhere?
+                for value in mask_values[mask]:
+                    if places[unit_i * stride + value] & ~positions:
+                        break
+                else:
+                    continue
 
-            # return in the special format (different from lockcell)
-            yield orientation, pencilmarks, [lockcell[3] for lockcell in lockcell_list]
+                # return in the special format
+                yield board.unit_names[unit_i], list(mask_values[mask]), [
+                    board.unit_coords[unit_i][position]
+                    for position in mask_positions[positions]
+                ]
 
     # Example:
     #
@@ -355,229 +786,330 @@ class Sudoku:
         # For each box, check each row/col and see if we have a dagger
         updates = list()
         for dagger in self.identify_daggers():
-            orientation, value, cells = dagger
+            orientation, line_i, value, cells = dagger
             # logging.debug(f"[PENCILMARKS] [DAGGER] [IDENTIFY] We found a dagger | {orientation=} {value=}, {cells=}")
 
-            if orientation == "row":
-                row_i, _ = cells[0]
-                for col_i in [c for c in range(9)]:
-                    reason = f"dagger in row {cells=}"
-                    cell_i = (row_i, col_i)
-                    if cell_i in cells:
-                        continue
-                    if self.erase_pencilmark_from_dagger(value, cell_i, reason):
-                        updates.append(reason, cell_i)
-                return updates
-            elif orientation == "col":
-                _, col_i = cells[0]
-                for row_i in [r for r in range(9)]:
-                    reason = f"dagger in col {cells=}"
-                    cell_i = (row_i, col_i)
-                    if cell_i in cells:
-                        continue
-                    if self.erase_pencilmark_from_dagger(value, cell_i, reason):
-                        pass
-            else:
-                logging.error(
+            if orientation not in ("row", "col"):
+                raise SudokuError(
                     f"[PENCILMARKS] [DAGGER] [FAIL] Unknown orientation from 'identify_daggers' | {orientation=}"
                 )
-                sys.exit(1)
 
-        return updates
+            # The rest of the line loses the value
+            reason = f"dagger in {orientation} {cells=}"
+            for cell_i in self.board.unit_coords[line_i]:
+                if cell_i in cells:
+                    continue
+                if self.erase_pencilmark_from("daggers", value, cell_i, reason):
+                    updates.append((reason, cell_i))
 
-    def dagger_cardinality(self, num, dagger_range):
-        count = 0
-        for cell_i in dagger_range:
-            row_i, col_i = cell_i
-            if num in self.pencilmarks[row_i][col_i]:
-                count += 1
-        if count == 1:
-            # logging.debug(f"[PENCILMARKS] [DAGGER] Not a real one")
-            pass
-        return count
+        return updates
 
     def identify_daggers(self):
-        for orientation, dagger_range, extra_range in self.generate_dagger_range():
-            for num in range(1, 10):
-                # Get the set of pencilmarks in a range
-                if num not in self.get_pencilmark_set_in_range_cells(dagger_range):
-                    continue
-                if num in self.get_pencilmark_set_in_range_cells(extra_range):
-                    continue
+        board = self.board
+        size = board.size
+        stride = board.stride
+        bits = board.bits
+        mask_size = board.mask_size
+        places = self.places
+        looked = self.dagger_places
+        for box_i in range(size):
+            # Nothing in this box moved since we last went through all of it
+            if self.unit_changes[2 * size + box_i] <= self.daggers_seen[box_i]:
+                continue
+            seen = self.changes
+
+            # Only the values whose places in the box moved since then. A
+            # value with one place left is a single that is already queued
+            base = (2 * size + box_i) * stride
+            last = box_i * stride
+            used = self.used_daggers[box_i]
+            nums = [
+                num
+                for num in range(1, size + 1)
+                if places[base + num] != looked[last + num]
+                and mask_size[places[base + num]] > 1
+                and not used & bits[num]
+            ]
+            for dagger_range in self.generate_dagger_range(box_i):
+                orientation, line_i, segment, cells, _ = dagger_range
+                for num in nums:
+                    # Where can this number go in the box? It has to show up
+                    # in the dagger part of the box and nowhere else
+                    if places[base + num] & ~segment:
+                        continue
+
+                    # Make sure to only use this dagger once.
+                    self.used_daggers[box_i] |= bits[num]
 
-                if self.dagger_cardinality(num, dagger_range) == 1:
+                    # return in the special format
+                    yield orientation, line_i, num, cells
+
+            # A dagger only erases outside of its own box, so this box is
+            # unchanged since 'seen'. Boxes we stop partway through stay dirty
+            self.daggers_seen[box_i] = seen
+            looked[last : last + stride] = places[base : base + stride]
+
+    def generate_dagger_range(self, box_i):
+        return self.board.dagger_ranges[box_i]
+
+    # Example:
+    #
+    #     7,7,7 | _,_,_ | _,_,_
+    #     ?,?,? | ?,?,? | ?,?,?
+    #     ?,?,? | ?,?,? | ?,?,?
+    #
+    # A dagger the other way around. If the 7 in the top row can only go in
+    # the top left box, it takes up that row of the box, so the rest of the
+    # box can't have a 7
+    def update_pencilmarks_claims(self):
+        updates = list()
+        for claim in self.identify_claims():
+            orientation, box_i, value, cells = claim
+            reason = f"claim in {orientation} {cells=}"
+            for cell_i in self.board.unit_coords[box_i]:
+                if cell_i in cells:
                     continue
+                if self.erase_pencilmark_from("claims", value, cell_i, reason):
+                    updates.append((reason, cell_i))
+        return updates
+
+    def identify_claims(self):
+        # Return it as:
+        # ORIENTATION, BOX UNIT_I, NUMBER, [CELL_I]
+        #
+        # A claim only erases inside its box and off its own line, so a line
+        # is clean once we went through it. A claim is only returned while
+        # its box still has the number somewhere else
+        board = self.board
+        size = board.size
+        stride = board.stride
+        mask_size = board.mask_size
+        places = self.places
+        for line_i in range(2 * size):
+            if self.unit_changes[line_i] <= self.claims_seen[line_i]:
+                continue
+            seen = self.changes
+
+            for segment, box_i, box_segment in board.claim_ranges[line_i]:
+                for num in range(1, size + 1):
+                    # It has to show up in this segment of the line and
+                    # nowhere else. A single is already queued to be placed
+                    positions = places[line_i * stride + num]
+                    if positions & ~segment or mask_size[positions] < 2:
+                        continue
+                    if not places[box_i * stride + num] & ~box_segment:
+                        continue
+
+                    # return in the special format
+                    yield board.unit_names[line_i], box_i, num, [
+                        board.unit_coords[line_i][position]
+                        for position in board.mask_positions[positions]
+                    ]
 
-                # Make sure to only use this lock once.
-                key = hash(tuple((orientation, num, tuple(dagger_range))))
-                if key in self.used_daggers:
+            self.claims_seen[line_i] = seen
+
+    # Example: in this row, 4 and 6 only fit in the 2 cells marked '*'
+    #
+    #     *,_,_ | _,*,_ | _,_,_
+    #
+    # Whatever else is pencilmarked in those 2 cells, they are the 4 and the
+    # 6, so everything else in them gets erased. A 'lock' seen from the
+    # values instead of the cells
+    def update_pencilmarks_hidden(self):
+        updates = list()
+        for hidden in self.identify_hidden():
+            orientation, values, cells = hidden
+            reason = f"hidden subset in {orientation} {cells=} have {values}"
+            for cell_i in cells:
+                for value in self.get_pencilmarks(cell_i):
+                    if value in values:
+                        continue
+                    if self.erase_pencilmark_from("hidden", value, cell_i, reason):
+                        updates.append((reason, cell_i))
+        return updates
+
+    def identify_hidden(self):
+        # A hidden subset is 'k' values that, in one unit, only fit in the
+        # same 'k' cells between them. Return it as:
+        # ORIENTATION, PENCILMARKS, [CELL_I]
+        #
+        # Erasing from a hidden subset changes its own unit, so a unit is
+        # marked seen before it gets searched, and it is searched once more
+        # after anything was erased from it. A subset is only returned while
+        # its cells have something else left to erase
+        board = self.board
+        stride = board.stride
+        mask_size = board.mask_size
+        mask_positions = board.mask_positions
+        candidates = self.candidates
+        places = self.places
+        for unit_i in range(board.units):
+            if self.unit_changes[unit_i] <= self.hidden_seen[unit_i]:
+                continue
+            self.hidden_seen[unit_i] = self.changes
+
+            small = [
+                (board.bits[value], positions)
+                for value in range(1, board.size + 1)
+                if 2 <= mask_size[positions := places[unit_i * stride + value]] <= 4
+            ]
+            if len(small) < 2:
+                continue
+            cells = board.unit_cells[unit_i]
+            for positions, mask in naked_subsets(small, mask_size=mask_size):
+                for position in mask_positions[positions]:
+                    if candidates[cells[position]] & ~mask:
+                        break
+                else:
                     continue
-                self.used_daggers.add(key)
 
                 # return in the special format
-                yield orientation, num, dagger_range
-
-    def generate_dagger_range(self):
-        for box_i in range(9):
-            r, c = list(self.get_box_range_from_box_i(box_i))[0]
-            for o0, o1, o2 in [(0, 1, 2), (2, 0, 1), (1, 2, 0)]:
-                yield "row", list(product([r + o0], [c, c + 1, c + 2])), list(
-                    product([r + o1, r + o2], [c, c + 1, c + 2])
-                )
-                yield "col", list(product([r, r + 1, r + 2], [c + o0])), list(
-                    product([r, r + 1, r + 2], [c + o1, c + o2])
-                )
+                yield board.unit_names[unit_i], list(board.mask_values[mask]), [
+                    board.unit_coords[unit_i][position] for position in mask_positions[positions]
+                ]
 
-    def erase_pencilmark_from_dagger(self, value, cell_i, reason):
-        # logging.debug(f"[PENCILMARKS] [DAGGER] [ERASE] [ATTEMPT] | {value=} {cell_i=} {reason=}")
-        row_i, col_i = cell_i
-        if value not in self.pencilmarks[row_i][col_i]:
-            return False
-        logging.info(
-            f"[PENCILMARKS] [DAGGER] [ERASE] | {value=} {cell_i=} {reason=}"
-        )
-        self.pencilmarks[row_i][col_i] = [
-            x for x in self.pencilmarks[row_i][col_i] if x != value
-        ]
+    # Example: the 5 in rows 1 and 4 only fits in the cols marked '*'
+    #
+    #     *,_,_ | _,_,_ | *,_,_
+    #     ...
+    #     *,_,_ | _,_,_ | *,_,_
+    #
+    # It goes in one corner of that rectangle or the opposite one. Either
+    # way it takes up both cols, so no other row can have a 5 in them. That
+    # is an X-Wing. 3 rows sharing 3 cols is a Swordfish and 4 sharing 4 is a
+    # Jellyfish. The same goes with rows and cols swapped
+    def update_pencilmarks_fish(self):
+        updates = list()
+        for fish in self.identify_fish():
+            orientation, value, lines, crossing = fish
+            reason = f"fish in {orientation}s {lines=} on {value}"
+            unit_coords = self.board.unit_coords
+            base = {cell_i for line_i in lines for cell_i in unit_coords[line_i]}
+            for line_i in crossing:
+                for cell_i in unit_coords[line_i]:
+                    if cell_i in base:
+                        continue
+                    if self.erase_pencilmark_from("fish", value, cell_i, reason):
+                        updates.append((reason, cell_i))
+        return updates
 
-    def scan_answers(self):
-        self.is_solved() or self.scan_answers_rows() or self.scan_answers_cols() or self.scan_answers_boxes() or self.scan_answers_cells()
-
-    def scan_answers_range(self, pencilmark_range: List[Pencilmark]):
-        # Check if there are any numbers that only show up once
-        found_one = [False] * 10
-        for range_index in range(len(pencilmark_range)):
-            pencilmark = pencilmark_range[range_index]
-            for num in pencilmark:
-                x = found_one[num]
-                if x is False:
-                    found_one[num] = range_index
-                if type(x) is int:
-                    found_one[num] = None
-                if x is None:
-                    continue
-        for i in range(len(found_one)):
-            if not found_one[i]:
-                continue
-            num = i
-            index = found_one[i]
-            return num, index
-        # logging.debug(f"There is nothing in this range that will give us an answer")
-        return None, None
-
-    def scan_answers_rows(self):
-        for row_i in range(9):
-            pencilmark_row = list(self.get_pencilmarks_in_range_row(row_i))
-            value, index = self.scan_answers_range(pencilmark_row)
-            if value is None or index is None:
-                # logging.debug(f"[ANSWERS] [SCAN] At this time, there is nothing to be found in this row | {row_i=}")
+    def identify_fish(self):
+        # Return it as:
+        # ORIENTATION, NUMBER, [LINE UNIT_I], [CROSSING LINE UNIT_I]
+        #
+        # Only numbers that lost a pencilmark since we last looked get
+        # searched. A fish is only returned while its crossing lines still
+        # have the number somewhere else
+        board = self.board
+        size = board.size
+        stride = board.stride
+        mask_size = board.mask_size
+        mask_positions = board.mask_positions
+        places = self.places
+        for num in range(1, size + 1):
+            if self.digit_changes[num] <= self.fish_seen[num]:
                 continue
-            cell_i = row_i, index
+            self.fish_seen[num] = self.changes
+
+            # Rows crossed by cols, then cols crossed by rows
+            for first, other in ((0, size), (size, 0)):
+                small = [
+                    (board.position_bits[i], positions)
+                    for i in range(size)
+                    if 2 <= mask_size[positions := places[(first + i) * stride + num]] <= 4
+                ]
+                if len(small) < 2:
+                    continue
+                for crossing, lines in naked_subsets(small, mask_size=mask_size):
+                    for i in mask_positions[crossing]:
+                        if places[(other + i) * stride + num] & ~lines:
+                            break
+                    else:
+                        continue
 
-            # Log, update state, and return success
-            self.log_answer(value, cell_i, "row")
-            self.pen_in_number(value, cell_i)
-            return True
+                    # return in the special format
+                    yield board.unit_names[first], num, [first + i for i in mask_positions[lines]], [
+                        other + i for i in mask_positions[crossing]
+                    ]
 
-    def scan_answers_cols(self):
-        for col_i in range(9):
-            pencilmark_col = list(self.get_pencilmarks_in_range_col(col_i))
-            value, index = self.scan_answers_range(pencilmark_col)
-            if value is None or index is None:
-                # logging.debug(f"[ANSWERS] [SCAN] At this time, there is nothing to be found in this col | {col_i=}")
+    def scan_answers(self):
+        return self.scan_answers_units() or self.scan_answers_cells()
+
+    # Singles can go stale while they sit in the queue (the cell got solved,
+    # or the value got placed elsewhere in the unit), so re-check each one
+    # against the current pencilmarks before using it
+    def scan_answers_units(self):
+        while self.hidden_singles:
+            unit_i, value = self.hidden_singles.popleft()
+            board = self.board
+            positions = self.places[unit_i * board.stride + value]
+            if board.mask_size[positions] != 1:
                 continue
-            cell_i = index, col_i
+            cell = board.unit_cells[unit_i][board.mask_positions[positions][0]]
+            cell_i = board.cell_coords[cell]
 
             # Log, update state, and return success
-            self.log_answer(value, cell_i, "col")
+            self.log_answer(value, cell_i, board.unit_names[unit_i])
+            self.deductions[board.unit_names[unit_i]] += 1
             self.pen_in_number(value, cell_i)
             return True
+        return False
 
-    def scan_answers_boxes(self):
-        for cell_i in product([0, 3, 6], [0, 3, 6]):
-            pencilmark_box = list(self.get_pencilmarks_in_range_box(cell_i))
-            value, index = self.scan_answers_range(pencilmark_box)
-            if value is None or index is None:
-                # logging.debug(f"[ANSWERS] [SCAN] At this time, there is nothing to be found in this box. | {cell_i=}")
+    def scan_answers_cells(self):
+        while self.naked_singles:
+            cell = self.naked_singles.popleft()
+            mask = self.candidates[cell]
+            board = self.board
+            if board.mask_size[mask] != 1:
                 continue
-            row_start, col_start = cell_i
-            row_i = row_start + int(index / 3)
-            col_i = col_start + index % 3
-            cell_i = row_i, col_i
+            cell_i = board.cell_coords[cell]
+            value = board.mask_values[mask][0]
 
             # Log, update state, and return success
-            self.log_answer(value, cell_i, "box")
+            self.log_answer(value, cell_i, "cell")
+            self.deductions["cell"] += 1
             self.pen_in_number(value, cell_i)
             return True
-
-    def scan_answers_cells(self):
-        for row_i in range(len(self.pencilmarks)):
-            for col_i in range(len(self.pencilmarks[row_i])):
-                pencilmark = self.pencilmarks[row_i][col_i]
-                if len(pencilmark) != 1:
-                    continue
-                cell_i = (row_i, col_i)
-                value = pencilmark[0]
-
-                # Log, update state, and return success
-                self.log_answer(value, cell_i, "cell")
-                self.pen_in_number(value, cell_i)
-                return True
+        return False
 
     def log_answer(self, value, cell_i, reason):
         logging.debug(
-            f"[ANSWERS] [SCAN] The value can only be in one place | {reason=} {value=} {cell_i=}"
+            "[ANSWERS] [SCAN] The value can only be in one place | reason=%r value=%r cell_i=%r",
+            reason,
+            value,
+            cell_i,
         )
 
     def pen_in_number(self, value, cell_i):
         row_i, col_i = cell_i
         logging.debug(
-            f"[ANSWERS] [RECORD] Trying to add a value to the box_numbers queue | {value=} {cell_i=}"
+            "[ANSWERS] [RECORD] Trying to add a value to the box_numbers queue | value=%r cell_i=%r",
+            value,
+            cell_i,
         )
-        self.box_numbers[row_i][col_i] = value
         if self.answers[row_i][col_i] != None:
-            logging.error(
+            raise ContradictionError(
                 f"[ANSWERS] [RECORD] [FAIL] You are placing a number in a col where it already has been. | {value=} {cell_i=}"
             )
-            sys.exit(1)
-            return
-
-    def get_pencilmarks_in_range_row(self, row_i):
-        for col_i in range(9):
-            yield self.pencilmarks[row_i][col_i]
-
-    def get_pencilmarks_in_range_col(self, col_i):
-        for row_i in range(9):
-            yield self.pencilmarks[row_i][col_i]
-
-    def get_pencilmarks_in_range_box(self, cell_i):
-        range_obj = self.get_box_range_from_cell(cell_i)
-        for r, c in range_obj:
-            yield self.pencilmarks[r][c]
-
-    def get_pencilmark_set_in_range_cells(self, cells):
-        ans = set()
-        for cell_i in cells:
-            r, c = cell_i
-            for pencilmark in self.pencilmarks[r][c]:
-                ans.add(pencilmark)
-        return ans
+        self.box_numbers.append((row_i, col_i, value))
 
     def get_box_range_from_box_i(self, box_i):
-        row_start = 3 * int(box_i / 3)
-        col_start = 3 * int(box_i % 3)
-        for row_i in range(row_start, row_start + 3):
-            for col_i in range(col_start, col_start + 3):
-                yield row_i, col_i
+        return self.board.box_ranges[box_i]
 
     def get_box_range_from_cell(self, cell_i):
-        box_i = self.get_box_i_from_cell(cell_i)
-        for ans in self.get_box_range_from_box_i(box_i):
-            yield ans
+        return self.board.box_ranges[self.get_box_i_from_cell(cell_i)]
 
     def get_box_i_from_cell(self, cell_i):
         row_i, col_i = cell_i
-        return 3 * int(row_i / 3) + int(col_i / 3)
+        return self.board.cell_box[row_i * self.board.size + col_i]
+
+    def get_unit_i_from_cell(self, orientation, cell_i):
+        row_i, col_i = cell_i
+        if orientation == "row":
+            return row_i
+        if orientation == "col":
+            return self.board.size + col_i
+        return 2 * self.board.size + self.get_box_i_from_cell(cell_i)
 
     def is_solved(self):
         for row in self.answers:
@@ -587,7 +1119,8 @@ class Sudoku:
         return True
 
     def log_pencilmarks(self):
-        logging.debug(f"[PENCILMARKS] [DATA]:\n" + str(self))
+        if root_logger.isEnabledFor(logging.DEBUG):
+            logging.debug(f"[PENCILMARKS] [DATA]:\n" + str(self))
 
     def dump_answers(self):
         ans = list()
@@ -595,28 +1128,83 @@ class Sudoku:
             ans.append("|".join([str(r).strip() if r else "_" for r in row]))
         return "\n".join(["Dumping answer:", *ans])
 
+    def compact_answers(self) -> str:
+        # One line of 81 characters (one per cell on bigger boards), '.' for
+        # cells we have no answer for
+        symbols = self.board.symbols
+        return "".join([symbols[r - 1] if r else "." for row in self.answers for r in row])
+
     def dump_initial_puzzle(self):
         ip = list()
         for row in self.initial_puzzle:
             ip.append("|".join([str(r) if r else "_" for r in row]))
         return "\n".join(["Dumping initial_puzzle:", *ip])
 
+    def search_for_answers(self):
+        from lib.search import Search
+
+        values = [r or 0 for row in self.answers for r in row]
+        logging.info(
+            f"[SEARCH] We are all out of clues, searching for the rest | open={values.count(0)}"
+        )
+        search = Search(values, self.candidates, self.board)
+        search.deadline = self.deadline
+        solution = search.first_solution()
+        self.search_nodes = search.nodes
+        if solution is None:
+            raise ContradictionError(
+                f"[SEARCH] [FAIL] There is no way to fill in the rest | nodes={search.nodes}"
+            )
+
+        logging.info(f"[SEARCH] Found the rest of the answers | nodes={search.nodes}")
+        for cell, value in enumerate(solution):
+            row_i, col_i = self.board.cell_coords[cell]
+            if self.answers[row_i][col_i] is None:
+                self.record_answer(row_i, col_i, value)
+                self.update_pencilmarks_cell((row_i, col_i))
+        return True
+
+    def count_rest(self, limit, workers):
+        from lib.search import Search, count_solutions_in_pool
+
+        if self.is_solved():
+            # Every technique only erases what can't be part of any solution,
+            # so if they filled in the grid, no other grid fits
+            logging.info(f"[COUNT] Solved without guessing, so the solution is unique")
+            return 1
+
+        values = [r or 0 for row in self.answers for r in row]
+        logging.info(
+            f"[COUNT] Counting the ways to fill in the rest | open={values.count(0)} {limit=} {workers=}"
+        )
+        search = Search(values, self.candidates, self.board)
+        if workers > 1:
+            solutions, self.search_nodes = count_solutions_in_pool(search, limit, workers)
+        else:
+            solutions = search.count_solutions(limit)
+            self.search_nodes = search.nodes
+        logging.info(f"[COUNT] Done | {solutions=} nodes={self.search_nodes}")
+        return solutions
+
     def endgame(self):
+        if self.counting is not None:
+            self.solutions = self.count_rest(*self.counting)
+            return self.solutions == 1
+
+        if not self.is_solved() and self.search:
+            self.search_for_answers()
+
         if self.is_solved():
             logging.info(f"[ENDGAME] Solved!")
-            logging.info(f"[ENDGAME] " + self.dump_initial_puzzle())
-            logging.info(f"[ENDGAME] " + self.dump_answers())
+            if root_logger.isEnabledFor(logging.INFO):
+                logging.info(f"[ENDGAME] " + self.dump_initial_puzzle())
+                logging.info(f"[ENDGAME] " + self.dump_answers())
             return True
 
         logging.error(f"[ENDGAME] [FAIL] Oh no - we are all out of clues")
-        logging.error(f"[ENDGAME] [FAIL] " + self.dump_initial_puzzle())
-        logging.error(f"[ENDGAME] [FAIL] \n" + str(self))
-        logging.error(f"[ENDGAME] [FAIL] " + self.dump_answers())
-        sys.exit(1)
-
-    def hash_pencilmarks(self):
-        hashme = ""
-        for r, c in product(range(9), range(9)):
-            hashme += "".join([str(n) for n in self.pencilmarks[r][c]])
-        return hash(hashme)
+        if root_logger.isEnabledFor(logging.ERROR):
+            logging.error(f"[ENDGAME] [FAIL] " + self.dump_initial_puzzle())
+            logging.error(f"[ENDGAME] [FAIL] \n" + str(self))
+            logging.error(f"[ENDGAME] [FAIL] " + self.dump_answers())
+        return False
 
@@ -0,0 +1,195 @@
+from functools import lru_cache
+
+""" The shape of an N²xN² sudoku board, worked out once as lookup tables """
+
+# A board of order 'n' has 'n * n' rows, cols, boxes and values: the usual
+# sudoku is order 3, 16x16 is order 4 and 25x25 is order 5.
+#
+# Values above 9 are written with letters, so every value is one character
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+
+# How many entries of each lazily worked out mask table to keep
+MASK_CACHE_SIZE = 1 << 14
+
+
+# Indexes like a tuple with one entry per mask, for masks too wide to list
+# every entry of up front (2^16 of them at order 4, 2^25 at order 5). Entries
+# are worked out when asked for, and only the 'maxsize' most recently used
+# are kept, so a long-lived process doesn't fill in the whole table
+class MaskTable:
+    def __init__(self, function, maxsize=MASK_CACHE_SIZE):
+        self.lookup = lru_cache(maxsize=maxsize)(function)
+
+    def __getitem__(self, mask):
+        return self.lookup(mask)
+
+
+# The number of values in a mask, for the same wide boards. Counting the bits
+# is as cheap as looking the count up, so nothing is kept
+class MaskSize:
+    def __getitem__(self, mask):
+        return mask.bit_count()
+
+
+# Pencilmarks are stored as masks: bit 'v - 1' is set while 'v' is still a
+# candidate for the cell. The same layout is used for "where can value v go"
+# masks, where bit 'p' stands for position 'p' inside a row/col/box.
+#
+# Cells are numbered 'row_i * size + col_i'. Units are numbered rows, then
+# cols, then boxes, 'size' of each, and each unit lists its cells in position
+# order. The "where can value v go" mask of unit 'unit_i' lives at
+# 'unit_i * stride + v'.
+class Topology:
+    def __init__(self, order):
+        size = order * order
+        self.order = order
+        self.size = size
+        self.cells = size * size
+        self.units = 3 * size
+        self.stride = size + 1
+        self.symbols = SYMBOLS[:size]
+        # The array typecode big enough for one mask
+        self.typecode = "H" if size <= 16 else "L"
+
+        self.full_mask = (1 << size) - 1
+        self.bits = tuple(1 << (value - 1) if value else 0 for value in range(size + 1))
+        self.position_bits = tuple(1 << p for p in range(size))
+        if size <= 9:
+            self.mask_values = tuple(
+                tuple(v for v in range(1, size + 1) if mask & self.bits[v])
+                for mask in range(self.full_mask + 1)
+            )
+            self.mask_positions = tuple(tuple(v - 1 for v in values) for values in self.mask_values)
+            self.mask_size = tuple(len(values) for values in self.mask_values)
+        else:
+            self.mask_values = MaskTable(
+                lambda mask: tuple(v for v in range(1, size + 1) if mask & self.bits[v])
+            )
+            self.mask_positions = MaskTable(
+                lambda mask: tuple(p for p in range(size) if mask >> p & 1)
+            )
+            self.mask_size = MaskSize()
+
+        self.cell_coords = tuple(divmod(cell, size) for cell in range(self.cells))
+        self.cell_box = tuple(
+            order * (row_i // order) + col_i // order for row_i, col_i in self.cell_coords
+        )
+        self.unit_names = ("row",) * size + ("col",) * size + ("box",) * size
+        self.unit_offsets = {"row": 0, "col": size, "box": 2 * size}
+        self.unit_cells = tuple(
+            [tuple(row_i * size + col_i for col_i in range(size)) for row_i in range(size)]
+            + [tuple(row_i * size + col_i for row_i in range(size)) for col_i in range(size)]
+            + [
+                tuple(
+                    (order * (box_i // order) + p // order) * size
+                    + order * (box_i % order)
+                    + p % order
+                    for p in range(size)
+                )
+                for box_i in range(size)
+            ]
+        )
+        self.unit_coords = tuple(
+            tuple(self.cell_coords[cell] for cell in cells) for cells in self.unit_cells
+        )
+        self.box_ranges = self.unit_coords[2 * size :]
+
+        # Each cell knows which units it belongs to along with its position
+        # bit inside each, and the other cells that share a unit with it
+        self.cell_units = tuple(
+            tuple(
+                (unit_i, 1 << self.unit_cells[unit_i].index(cell))
+                for unit_i in range(self.units)
+                if cell in self.unit_cells[unit_i]
+            )
+            for cell in range(self.cells)
+        )
+        self.peers = tuple(
+            tuple(
+                sorted(
+                    set().union(*(self.unit_cells[unit_i] for unit_i, _ in self.cell_units[cell]))
+                    - {cell}
+                )
+            )
+            for cell in range(self.cells)
+        )
+
+        # Where a box and a line cross: a row of the box is 'order' positions
+        # in a row, a col of the box is every 'order'th position
+        box_row = (1 << order) - 1
+        box_col = sum(1 << (order * k) for k in range(order))
+
+        # Box-line intersections, in the order the daggers look at them: the
+        # first line through the box, the last, then the ones in between. For
+        # each box we list every row/col segment running through it:
+        #   (orientation, line unit_i, positions mask inside the box,
+        #    dagger range, extra range)
+        # where the dagger range is the segment itself and the extra range is
+        # the rest of the box.
+        offsets = (0, order - 1) + tuple(range(1, order - 1))
+        self.dagger_ranges = tuple(
+            tuple(
+                (
+                    orientation,
+                    line_i,
+                    segment,
+                    tuple(self.box_ranges[box_i][p] for p in self.mask_positions[segment]),
+                    tuple(
+                        self.box_ranges[box_i][p]
+                        for p in self.mask_positions[self.full_mask ^ segment]
+                    ),
+                )
+                for o in offsets
+                for orientation, line_i, segment in (
+                    ("row", order * (box_i // order) + o, box_row << (order * o)),
+                    ("col", size + order * (box_i % order) + o, box_col << o),
+                )
+            )
+            for box_i in range(size)
+        )
+
+        # The same intersections seen from the line. For each row/col, one
+        # entry per box it runs through:
+        #   (positions mask inside the line, box unit_i, positions mask inside
+        #    the box)
+        self.claim_ranges = tuple(
+            [
+                tuple(
+                    (
+                        box_row << (order * s),
+                        2 * size + order * (row_i // order) + s,
+                        box_row << (order * (row_i % order)),
+                    )
+                    for s in range(order)
+                )
+                for row_i in range(size)
+            ]
+            + [
+                tuple(
+                    (
+                        box_row << (order * s),
+                        2 * size + order * s + col_i // order,
+                        box_col << (col_i % order),
+                    )
+                    for s in range(order)
+                )
+                for col_i in range(size)
+            ]
+        )
+
+
+TOPOLOGIES = dict()
+
+
+def topology(order):
+    if order not in TOPOLOGIES:
+        TOPOLOGIES[order] = Topology(order)
+    return TOPOLOGIES[order]
+
+
+def order_of(size):
+    # The order of a board 'size' cells wide, or None if there's no such board
+    order = 1
+    while order * order < size:
+        order += 1
+    return order if order * order == size and order >= 2 else None
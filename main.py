@@ -1,30 +1,254 @@
 #!/usr/bin/env python3
 import argparse
 import logging
+import math
 import sys
+from itertools import chain, islice
 
 from lib.logging import setup_logging
-from lib.sudoku import Sudoku
+from lib.reader import iter_puzzles
+from lib.sudoku import Sudoku, SudokuError
 
 
 def main():
-    setup_logging()
     args = parse_args()
-    with open(args.sudoku_file) as f:
-        sudoku = Sudoku(f)
-        we_are_done = False
-        while not we_are_done:
-            we_are_done = sudoku.proceed()
-            print(sudoku)
+    if args.profile is None:
+        run(args)
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run, args)
+    finally:
+        if args.profile == "-":
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+        else:
+            profiler.dump_stats(args.profile)
+
+
+def run(args):
+    if args.quiet:
+        setup_logging(no_logfile=True, level=logging.WARNING)
+    else:
+        setup_logging(
+            no_logfile=args.no_log_file,
+            level=getattr(logging, args.log_level),
+            logfile=args.log_file,
+        )
+    logging.debug(f"[INIT] Parsed args | {args=}")
+    trace = open(args.trace, "w") if args.trace is not None else None
+    # Go through every puzzle even when one of them fails, and exit 1 at the
+    # end if any did
+    puzzles = failed = 0
+    # Answers get labelled with their puzzle's name when there is more than
+    # one puzzle, so look one puzzle ahead
+    jobs = iter_puzzles(args.sudoku_file)
+    ahead = list(islice(jobs, 2))
+    labelled = len(ahead) > 1
+    try:
+        for name, lines in chain(ahead, jobs):
+            puzzles += 1
+            if not solve(name, lines, args, trace, labelled):
+                failed += 1
+    finally:
+        if trace is not None:
+            trace.close()
+    if failed:
+        logging.error(f"[ENDGAME] [FAIL] Not every puzzle was solved | {failed=} {puzzles=}")
+        sys.exit(1)
+
+
+# Returns whether the puzzle was solved (or, when counting, has exactly one
+# solution)
+def solve(name, lines, args, trace, labelled=False):
+    logging.info(f"[INIT] Solving | {name=}")
+    if args.portfolio is not None:
+        return race_portfolio(name, lines, args, labelled)
+    try:
+        sudoku = Sudoku(lines, search=args.search, stats=args.stats, trace=trace is not None)
+    except SudokuError as e:
+        # Can't be read, or its givens clash
+        logging.error(f"[INIT] [FAIL] {e}")
+        return False
+    on_step = step_printer(sudoku, args.output_mode)
+    try:
+        if args.count_solutions is not None:
+            result = sudoku.count_solutions(args.count_solutions, args.workers, on_step=on_step)
+        else:
+            result = sudoku.solve(on_step=on_step)
+    except SudokuError as e:
+        logging.error(f"[ENDGAME] [FAIL] {e}")
+        return False
+    finally:
+        # Whatever happened, keep what we measured. 'json' is only needed for
+        # these, so plain runs don't pay to import it
+        if trace is not None or args.stats:
+            import json
+        if trace is not None:
+            for event in sudoku.stats.trace:
+                trace.write(json.dumps({"puzzle": name, **event}) + "\n")
+        if args.stats:
+            print(json.dumps({"puzzle": name, **sudoku.stats.report()}), file=sys.stderr)
+    print_answers(result.grid, name if labelled else None)
+    if args.count_solutions is not None:
+        # Exactly one solution is what makes it a proper puzzle
+        more = " or more" if result.solutions == args.count_solutions > 1 else ""
+        print(f"Solutions: {result.solutions}{more}")
+        return result.solutions == 1
+    return result.status == "solved"
+
+
+def race_portfolio(name, lines, args, labelled=False):
+    # Solve with every configuration at once and show the answers the winner
+    # ended up with. The puzzle is only ever read and solved in the racing
+    # processes. Only imported here, so plain runs don't pay for
+    # 'multiprocessing'
+    from lib.portfolio import CONFIGS, PORTFOLIO, race
+
+    configs = [CONFIGS[config] for config in args.portfolio] or PORTFOLIO
+    try:
+        winner, result, _ = race(lines, configs, search=args.search)
+    except SudokuError as e:
+        # Can't be read, contradicts itself, or every configuration failed
+        logging.error(f"[ENDGAME] [FAIL] {e}")
+        return False
+    print_answers(result.grid, name if labelled else None)
+    if result.status != "solved":
+        print(f"Every configuration stalled, kept: {winner}")
+        return False
+    print(f"Won by: {winner}")
+    return True
+
+
+def print_answers(grid, name=None):
+    # The answers from 'SolveResult.grid', one row per line and '_' for cells
+    # without one. Under the puzzle's name if there is one
+    if name is not None:
+        print(f"[{name}]")
+    grid = grid.replace(".", "_")
+    size = math.isqrt(len(grid))
+    for row_i in range(size):
+        print("|".join(grid[row_i * size : (row_i + 1) * size]))
+
+
+def step_printer(sudoku, mode):
+    # "final" only prints the answers once it's done, "full" also prints the
+    # board after every step, and "diff" just the cells each step changed
+    if mode == "final":
+        return None
+
+    from lib.render import BoardRenderer, describe_change
+
+    renderer = BoardRenderer(sudoku.board.size)
+    renderer.update(sudoku.candidates)
+    steps = 0
+
+    def on_step(sudoku):
+        nonlocal steps
+        steps += 1
+        if mode == "full":
+            print(f"[STEP {steps}]\n{renderer.render(sudoku.candidates)}")
+            return
+        for change in renderer.update(sudoku.candidates):
+            print(f"[STEP {steps}] {describe_change(change, sudoku.answers)}")
+
+    return on_step
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Solve a sudoku from a *.sudoku file")
     parser.add_argument(
-        "--sudoku_file", type=str, help="The file to pull the sudoku puzzle from"
+        "--sudoku_file",
+        type=str,
+        help="The file to pull the sudoku puzzles from ('*.sudoku' blocks or 81 characters per line, 256 or 625 for 16x16 or 25x25), - for stdin",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Fall back to trial and error when the logical techniques run out of clues",
+    )
+    parser.add_argument(
+        "--count-solutions",
+        type=int,
+        default=None,
+        metavar="LIMIT",
+        help="Count the puzzle's solutions instead, stopping at LIMIT (2 is enough to tell whether it has exactly one). Exits 1 unless it has exactly one",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="With --count-solutions, how many processes to count the search's branches in",
+    )
+    parser.add_argument(
+        "--portfolio",
+        nargs="*",
+        default=None,
+        metavar="CONFIG",
+        help="Race several solver configurations on each puzzle, one process each, and keep the first to finish. Names the configurations to race (default: all of them: default, singles, intersections-first, subsets-first, logic-only). Can't be used with --count-solutions, --stats, --trace or --output-mode",
+    )
+    parser.add_argument(
+        "--output-mode",
+        choices=["final", "diff", "full"],
+        default="final",
+        help="Print only the answers once it's done, also the cells each step changed, or also the whole board after every step",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="The lowest level to print to the terminal",
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default=None,
+        help="Where to write the DEBUG log (default: $XDG_DATA_HOME/ebi/ebi.log)",
+    )
+    parser.add_argument(
+        "--no-log-file", action="store_true", help="Don't write the DEBUG log at all"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print per-technique timings and counters for each puzzle to stderr, as JSON",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        help="Write every deduction to this file, one JSON event per line",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        help="Run under cProfile. Prints the top functions to stderr, or dumps the stats to the given file",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Production mode: only warnings and errors, and no log file",
     )
     args = parser.parse_args()
-    logging.debug(f"[INIT] Parsed args | {args=}")
+    if args.count_solutions is not None and args.count_solutions < 1:
+        parser.error("--count-solutions needs a LIMIT of 1 or more")
+    if args.workers < 1:
+        parser.error("--workers needs to be 1 or more")
+    if args.portfolio is not None:
+        from lib.portfolio import CONFIGS
+
+        unknown = sorted(set(args.portfolio) - set(CONFIGS))
+        if unknown:
+            parser.error(f"--portfolio: unknown configurations {unknown}, pick from {list(CONFIGS)}")
+        if args.count_solutions is not None or args.stats or args.trace is not None:
+            parser.error("--portfolio can't be used with --count-solutions, --stats or --trace")
+        if args.output_mode != "final":
+            parser.error("--portfolio only prints the answers")
     return args
 
 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import logging
+
+from lib.batch import add_cache_argument, add_workers_argument
+from lib.logging import setup_logging
+from lib.server import serve
+
+
+def main():
+    args = parse_args()
+    setup_logging(no_logfile=True)
+    logging.debug(f"[INIT] Parsed args | {args=}")
+    try:
+        asyncio.run(
+            serve(
+                path=args.socket,
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                max_in_flight=args.max_in_flight,
+                timeout=args.timeout,
+                cache=args.cache,
+            )
+        )
+    except KeyboardInterrupt:
+        logging.info("[SERVER] Shutting down")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve sudoku solutions over newline-delimited JSON, from one warm pool of worker processes"
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Listen on this unix socket instead of TCP",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="TCP host to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    add_workers_argument(parser)
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=64,
+        help="How many puzzles can be solving at once, across every client, before the server stops reading requests",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        help="Seconds a worker may spend on one puzzle before it is answered with status 'timeout'. Time spent waiting for a free worker doesn't count",
+    )
+    add_cache_argument(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import logging
+import random
+
+import pytest
+
+from lib.batch import solve_chunk
+from lib.cache import (
+    SYMMETRIES,
+    SolutionCache,
+    canonicalize,
+    solution_from_canonical,
+    solution_to_canonical,
+)
+from lib.reader import expand_line
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+PUZZLE = "7.....61..42....5.1..5....2..93....88.4..1..6.2..6.......73...4.....4.....61.8.9."
+SOLUTION = "735482619942617853168593472619345728854271936327869541591736284283954167476128395"
+
+
+def as_grid(line):
+    return [0 if char == "." else int(char) for char in line]
+
+
+def turn(line, perm):
+    return "".join(line[cell] for cell in perm)
+
+
+def relabel(line, digits):
+    # Digit 'd' becomes 'digits[d - 1]'
+    return "".join(char if char == "." else str(digits[int(char) - 1]) for char in line)
+
+
+def copies():
+    # (puzzle, solution) for every rotation/reflection of the puzzle, each
+    # with its digits relabelled at random
+    rng = random.Random(0)
+    for perm in SYMMETRIES:
+        digits = list(range(1, 10))
+        rng.shuffle(digits)
+        yield relabel(turn(PUZZLE, perm), digits), relabel(turn(SOLUTION, perm), digits)
+
+
+def is_valid(solution):
+    rows = [solution[row_i * 9 : row_i * 9 + 9] for row_i in range(9)]
+    cols = [solution[col_i::9] for col_i in range(9)]
+    boxes = [
+        "".join(solution[(3 * (box_i // 3) + p // 3) * 9 + 3 * (box_i % 3) + p % 3] for p in range(9))
+        for box_i in range(9)
+    ]
+    return all(sorted(unit) == list("123456789") for unit in rows + cols + boxes)
+
+
+def agrees(puzzle, solution):
+    return all(given in (".", answer) for given, answer in zip(puzzle, solution))
+
+
+def test_copies_share_a_canonical_form():
+    key = canonicalize(as_grid(PUZZLE))[0]
+    for puzzle, _ in copies():
+        assert canonicalize(as_grid(puzzle))[0] == key
+
+
+@pytest.mark.parametrize("puzzle,solution", list(copies()))
+def test_solution_round_trips_through_the_canonical_form(puzzle, solution):
+    _, perm, digits = canonicalize(as_grid(puzzle))
+    canonical = solution_to_canonical(solution, perm, digits)
+    assert solution_from_canonical(canonical, perm, digits) == solution
+
+
+def test_copies_are_answered_from_the_cache():
+    cache = SolutionCache()
+    cache.put(as_grid(PUZZLE), SOLUTION)
+    for puzzle, solution in copies():
+        answer = cache.get(as_grid(puzzle))
+        assert answer == solution
+        assert is_valid(answer)
+        assert agrees(puzzle, answer)
+    assert cache.misses == 0
+
+
+def test_copies_are_answered_from_the_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = SolutionCache(path)
+    first.put(as_grid(PUZZLE), SOLUTION)
+    first.close()
+
+    cache = SolutionCache(path)
+    for puzzle, solution in copies():
+        assert cache.get(as_grid(puzzle)) == solution
+    cache.close()
+
+
+def test_other_puzzles_miss():
+    cache = SolutionCache()
+    cache.put(as_grid(PUZZLE), SOLUTION)
+    assert cache.get(as_grid("." + PUZZLE[1:])) is None
+    assert cache.misses == 1
+
+
+def test_a_digit_missing_from_the_givens():
+    # None of the givens is a 9, so the canonical digits don't know about it
+    puzzle = PUZZLE.replace("9", ".")
+    cache = SolutionCache()
+    cache.put(as_grid(puzzle), SOLUTION)
+    transposed = turn(puzzle, SYMMETRIES[4])
+    answer = cache.get(as_grid(transposed))
+    assert answer == turn(SOLUTION, SYMMETRIES[4])
+    assert is_valid(answer)
+    assert agrees(transposed, answer)
+
+
+def test_guessed_solutions_are_not_cached():
+    # Without its first given the puzzle has many solutions, so the
+    # techniques stall and only the search gets to one
+    puzzle = "." + PUZZLE[1:]
+    cache = SolutionCache()
+    [record] = solve_chunk([("guessed", expand_line(puzzle))], search=True, cache=cache)
+    assert record["status"] == "solved"
+    assert record["search_nodes"] > 0
+    assert cache.get(as_grid(puzzle)) is None
+
+    # One the techniques solve on their own is
+    logical = "75.24......37...2.9...5..4......12..81.....54..24......7..1...2.8...64......97.86"
+    [record] = solve_chunk([("logical", expand_line(logical))], cache=cache)
+    assert record["status"] == "solved"
+    assert record["search_nodes"] == 0
+    assert cache.get(as_grid(logical)) == record["grid"]
@@ -0,0 +1,79 @@
+import logging
+import time
+
+import pytest
+
+from lib.batch import solve_puzzle
+from lib.reader import expand_line
+from lib.search import Search, count_solutions_in_pool
+from lib.sudoku import BOARD, OutOfTimeError, Sudoku
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+# A minimal puzzle: it has one solution, and taking any given away lets in
+# more
+UNIQUE = "7.....61..42....5.1..5....2..93....88.4..1..6.2..6.......73...4.....4.....61.8.9."
+SOLUTION = "735482619942617853168593472619345728854271936327869541591736284283954167476128395"
+# Without its first given it has 32 solutions
+MULTIPLE = "." + UNIQUE[1:]
+# A 5 where the solution has a 3. No given repeats, but nothing fits
+CONTRADICTION = UNIQUE[:1] + "5" + UNIQUE[2:]
+# No givens at all, far more solutions than any limit
+EMPTY = "." * 81
+
+CASES = [(UNIQUE, 1), (MULTIPLE, 32), (CONTRADICTION, 0)]
+
+
+def search_for(line):
+    # A search over the bare givens, without any of the logical techniques.
+    # None if the givens already clash
+    search = Search([0] * 81, [BOARD.full_mask] * 81)
+    for cell, char in enumerate(line):
+        if char != ".":
+            if not search.assign(search.values, search.masks, cell, int(char)):
+                return None
+    return search
+
+
+@pytest.mark.parametrize("line,expected", CASES)
+def test_search_counts_solutions(line, expected):
+    search = search_for(line)
+    assert search is not None
+    assert search.count_solutions(limit=50) == expected
+
+
+def test_search_stops_at_the_limit():
+    for limit in (1, 2, 5):
+        assert search_for(EMPTY).count_solutions(limit) == limit
+
+
+def test_first_solution_is_the_solution():
+    solution = search_for(UNIQUE).first_solution()
+    assert "".join(map(str, solution)) == SOLUTION
+
+
+@pytest.mark.parametrize("line,expected", CASES + [(EMPTY, 5)])
+def test_pool_counts_like_the_search(line, expected):
+    solutions, nodes = count_solutions_in_pool(search_for(line), limit=5, workers=2)
+    assert solutions == min(expected, 5)
+    assert nodes > 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("line,expected", CASES + [(EMPTY, 2)])
+def test_sudoku_counts_solutions(line, expected, workers):
+    result = Sudoku(expand_line(line)).count_solutions(limit=2, workers=workers)
+    assert result.solutions == min(expected, 2)
+
+
+def test_search_gives_up_at_its_deadline():
+    search = search_for(EMPTY)
+    search.deadline = time.monotonic()
+    with pytest.raises(OutOfTimeError):
+        search.first_solution()
+
+
+def test_a_puzzle_out_of_time_is_a_timeout():
+    record = solve_puzzle(("empty", expand_line("." * 625)), search=True, timeout=0.1)
+    assert record["status"] == "timeout"
+    assert record["elapsed"] < 5
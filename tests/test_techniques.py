@@ -0,0 +1,114 @@
+import logging
+
+import pytest
+
+from lib.reader import expand_line
+from lib.sudoku import BOARD, ContradictionError, Sudoku, naked_subsets
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+# Every pencilmark still there, so a test only has to erase its way to the
+# pattern it is after
+EMPTY = "." * 81
+
+
+def empty_sudoku():
+    return Sudoku(expand_line(EMPTY))
+
+
+def erase(sudoku, value, cells):
+    for cell_i in cells:
+        sudoku.erase_pencilmark(value, cell_i)
+
+
+def erased(updates):
+    return {cell_i for _, cell_i in updates}
+
+
+def mask_of(values):
+    mask = 0
+    for value in values:
+        mask |= BOARD.bits[value]
+    return mask
+
+
+def test_claim_erases_the_rest_of_its_box():
+    # In row 0 the 7 only fits in the top left box, so the rest of that box
+    # can't have one
+    sudoku = empty_sudoku()
+    erase(sudoku, 7, [(0, col_i) for col_i in range(3, 9)])
+    updates = sudoku.update_pencilmarks_claims()
+    expected = {(row_i, col_i) for row_i in (1, 2) for col_i in range(3)}
+    assert erased(updates) == expected
+    for cell_i in expected:
+        assert 7 not in sudoku.get_pencilmarks(cell_i)
+
+
+def test_hidden_pair_erases_the_rest_of_its_cells():
+    # In row 0 the 1 and the 2 only fit in its first 2 cells, so those cells
+    # are the 1 and the 2
+    sudoku = empty_sudoku()
+    for value in (1, 2):
+        erase(sudoku, value, [(0, col_i) for col_i in range(2, 9)])
+    updates = sudoku.update_pencilmarks_hidden()
+    assert erased(updates) == {(0, 0), (0, 1)}
+    assert sudoku.get_pencilmarks((0, 0)) == [1, 2]
+    assert sudoku.get_pencilmarks((0, 1)) == [1, 2]
+
+
+def test_x_wing_erases_the_rest_of_its_cols():
+    # In rows 0 and 3 the 5 only fits in cols 0 and 6, so no other row can
+    # have a 5 in those cols
+    sudoku = empty_sudoku()
+    for row_i in (0, 3):
+        erase(sudoku, 5, [(row_i, col_i) for col_i in range(9) if col_i not in (0, 6)])
+    updates = sudoku.update_pencilmarks_fish()
+    expected = {(row_i, col_i) for row_i in range(9) if row_i not in (0, 3) for col_i in (0, 6)}
+    assert erased(updates) == expected
+    for cell_i in expected:
+        assert 5 not in sudoku.get_pencilmarks(cell_i)
+
+
+def test_naked_subsets_finds_a_triple_without_identical_cells():
+    small = [
+        (BOARD.position_bits[0], mask_of((1, 2))),
+        (BOARD.position_bits[1], mask_of((2, 3))),
+        (BOARD.position_bits[2], mask_of((4, 5, 6))),
+        (BOARD.position_bits[3], mask_of((1, 3))),
+    ]
+    found = naked_subsets(small, mask_size=BOARD.mask_size)
+    positions = BOARD.position_bits[0] | BOARD.position_bits[1] | BOARD.position_bits[3]
+    assert found == [(mask_of((1, 2, 3)), positions)]
+
+
+def test_lock_on_a_triple_without_identical_cells():
+    # The first 3 cells of row 0 are {1,2}, {2,3} and {1,3}: between them
+    # they are the 1, the 2 and the 3, for their row and for their box
+    sudoku = empty_sudoku()
+    triple = {(0, 0): (1, 2), (0, 1): (2, 3), (0, 2): (1, 3)}
+    for cell_i, keep in triple.items():
+        for value in range(1, 10):
+            if value not in keep:
+                sudoku.erase_pencilmark(value, cell_i)
+    updates = sudoku.update_pencilmarks_locks()
+    expected = {(0, col_i) for col_i in range(3, 9)} | {
+        (row_i, col_i) for row_i in (1, 2) for col_i in range(3)
+    }
+    assert erased(updates) == expected
+    for cell_i in expected:
+        assert not {1, 2, 3} & set(sudoku.get_pencilmarks(cell_i))
+
+
+def test_a_cell_with_nothing_left_is_a_contradiction():
+    sudoku = empty_sudoku()
+    for value in range(1, 9):
+        sudoku.erase_pencilmark(value, (4, 4))
+    with pytest.raises(ContradictionError, match="nothing left to put in a cell"):
+        sudoku.erase_pencilmark(9, (4, 4))
+
+
+def test_a_value_with_nowhere_left_is_a_contradiction():
+    sudoku = empty_sudoku()
+    erase(sudoku, 4, [(0, col_i) for col_i in range(8)])
+    with pytest.raises(ContradictionError, match="nowhere left to put a value in a row"):
+        sudoku.erase_pencilmark(4, (0, 8))